@@ -0,0 +1,71 @@
+# actions.py
+import os
+
+import metrics
+from metrics import now
+from presets import changed_params
+from recorder import Replay, recording_path
+from modules.chatbox import CHATBOX_INPUT
+
+
+class ActionRunner:
+    """
+    Carries out what CommandSet.dispatch() returns, without Qt; the window and the daemon share it.
+
+    host is the window or a daemon worker and has commands, osc, paced, presets,
+    param_values, current_avatar_id, replays and log(msg).
+    send(path, value, delay_s) sends one OSC message now or after delay_s;
+    later(delay_s, fn, *args) runs fn after delay_s on the thread the host sends from.
+    """
+
+    def __init__(self, host, send, later):
+        self.host = host
+        self.send = send
+        self.later = later
+
+    def on_phrase(self, phrase, param_types=None):
+        """param_types: {address: 'Float' | 'Int' | 'Bool'} of the current avatar, for slot values."""
+        t0 = now()
+        host = self.host
+        for cmd, slots, actions in host.commands.dispatch(phrase, host.current_avatar_id, host.param_values, param_types):
+            host.log(f"Matched command '{cmd['phrase']}'" + (f" with {slots}" if slots else ""))
+            for action in actions:
+                kind = action[0]
+                if kind == 'osc':
+                    _, path, new_v, delay_s = action
+                    self.send(path, new_v, delay_s)
+                elif kind == 'chatbox':
+                    _, text, delay_s = action
+                    self.send(CHATBOX_INPUT, [text, True, True], delay_s)
+                elif kind == 'preset':
+                    _, name, delay_s = action
+                    self.later(delay_s, self.apply_preset, name)
+                else:
+                    _, name, speed, patterns, delay_s = action
+                    self.later(delay_s, self.start_replay, name, speed, patterns)
+        metrics.stage["match"].since(t0)
+
+    def apply_preset(self, name):
+        host = self.host
+        preset = host.presets.get(host.current_avatar_id, {}).get(name) or host.presets.get('global', {}).get(name)
+        if preset is None:
+            host.log(f"Preset not found for this avatar: {name}")
+            return
+        items = changed_params(preset, host.param_values)
+        host.paced.send_many(items)
+        host.log(f"Applying preset '{name}': {len(items)} of {len(preset)} parameters differ")
+
+    def start_replay(self, name, speed, patterns):
+        host = self.host
+        path = recording_path(name)
+        if not os.path.isfile(path):
+            host.log(f"Recording not found: {path}")
+            return
+        old = host.replays.get(name)
+        if old is not None:
+            old.stop()
+        include = [p.strip() for p in patterns.split(',') if p.strip()]
+        replay = Replay(host.osc, path, speed=speed, include=include)
+        host.replays[name] = replay
+        replay.start()
+        host.log(f"Replaying {name} at {speed}x")
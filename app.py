@@ -2,12 +2,17 @@
 import sys
 from PyQt5 import QtWidgets
 from gui import MainWindow
+from profiler import profiler
 
 def main():
+    # --profile or --profile=cprofile, see profiler.py
+    for arg in sys.argv[1:]:
+        if arg == "--profile" or arg.startswith("--profile="):
+            profiler.configure(arg.partition("=")[2] or "SAMPLE").start()
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    sys.exit(profiler.wrap(app.exec_, "gui")())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+# audio_source.py
+import sys
+import time
+import wave
+import threading
+import metrics
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 3000 #change for buffer lenght
+
+
+class MicrophoneSource:
+    """
+    A local input device through sounddevice, what VoiceRecognizer listens to by default.
+
+    Audio sources have start(put) and stop(); put(block) takes 16 kHz int16 mono
+    PCM as bytes and may be called from any thread.
+    """
+
+    def __init__(self, device=None):
+        self.device = device
+        self.stream = None
+
+    def start(self, put):
+        import sounddevice as sd
+
+        def callback(indata, frames, time, status):
+            if status:
+                # Print any audio stream warnings to stderr
+                print(f"Audio status: {status}", file=sys.stderr)
+                metrics.audio_dropped.inc()
+            metrics.audio_blocks.inc()
+            # time of the newest sample vs. when the driver delivered the block
+            metrics.stage["capture"].observe(max(0.0, time.currentTime - time.inputBufferAdcTime))
+            put(bytes(indata))
+
+        self.stream = sd.RawInputStream(
+            samplerate=SAMPLE_RATE,
+            blocksize=BLOCK_SIZE,
+            device=self.device,
+            dtype="int16",
+            channels=1,
+            callback=callback
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class FileAudioSource:
+    """
+    Plays a 16 kHz mono 16-bit WAV file (e.g. a black box export) as if it were the microphone.
+
+    realtime=False feeds blocks as fast as the decoder takes them. When the file
+    is done, finished is set; blocks() gives the same audio without a thread.
+    """
+
+    def __init__(self, path, realtime=True):
+        self.path = path
+        self.realtime = realtime
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def blocks(self):
+        with wave.open(self.path, 'rb') as w:
+            if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1 or w.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: need {SAMPLE_RATE} Hz mono 16-bit, got "
+                                 f"{w.getframerate()} Hz, {w.getnchannels()} ch, {8 * w.getsampwidth()}-bit")
+            while True:
+                data = w.readframes(BLOCK_SIZE)
+                if not data:
+                    return
+                yield data
+
+    def start(self, put):
+        self.finished.clear()
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, args=(put,), daemon=True, name="file-audio")
+        self.thread.start()
+
+    def _run(self, put):
+        next_at = time.monotonic()
+        for data in self.blocks():
+            if self._stop.is_set():
+                break
+            metrics.audio_blocks.inc()
+            put(data)
+            if self.realtime:
+                next_at += len(data) / 2 / SAMPLE_RATE
+                self._stop.wait(max(0.0, next_at - time.monotonic()))
+        self.finished.set()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,183 @@
+# avatar_params.py
+import os
+import json
+import threading
+import urllib.request
+
+CACHE_FILE = 'oscquery_cache.json'
+OSCQUERY_TYPES = {'f': 'Float', 'i': 'Int', 'T': 'Bool', 'F': 'Bool'}
+
+
+def vrchat_osc_root():
+    return os.path.join(os.path.expanduser('~'), 'AppData', 'LocalLow', 'VRChat', 'VRChat', 'OSC')
+
+
+def parse_avatar_config(data):
+    """Parameters from a VRChat avatar OSC config (the per-avatar JSON file)."""
+    params = []
+    for p in data.get('parameters', []):
+        inp = p.get('input', {})
+        if 'address' in inp:
+            # save both address and declared type
+            params.append({'address': inp['address'], 'type': inp.get('type', 'Float')})
+    return params
+
+
+def load_avatar_config_file(avatar_id, root=None):
+    """Read the config VRChat wrote for avatar_id. Windows only, raises when it isn't there."""
+    root = root or vrchat_osc_root()
+    users = [d for d in os.listdir(root) if d.startswith('usr_')]
+    users.sort(key=lambda u: os.path.getmtime(os.path.join(root, u)), reverse=True)
+    cfg = os.path.join(root, users[0], 'Avatars', f'{avatar_id}.json')
+    if not os.path.isfile(cfg): raise FileNotFoundError(cfg)
+    with open(cfg, 'rb') as f:
+        raw = f.read()
+    txt = raw.decode('utf-8-sig', errors='replace').strip()
+    if not txt: raise ValueError("Empty file")
+    return parse_avatar_config(json.loads(txt))
+
+
+def parse_oscquery_tree(node):
+    """Flatten an OSCQuery /avatar node into (avatar_id, [{'address', 'type'}])."""
+    contents = node.get('CONTENTS', {})
+    avatar_id = None
+    change = contents.get('change', {})
+    if change.get('VALUE'):
+        avatar_id = change['VALUE'][0]
+    params = []
+    stack = [contents.get('parameters', {})]
+    while stack:
+        n = stack.pop()
+        ptype = OSCQUERY_TYPES.get(n.get('TYPE', ''))
+        if ptype and 'FULL_PATH' in n:
+            params.append({'address': n['FULL_PATH'], 'type': ptype})
+        stack.extend(n.get('CONTENTS', {}).values())
+    params.sort(key=lambda p: p['address'])
+    return avatar_id, params
+
+
+def discover_oscquery_port(timeout=1.0):
+    """Find VRChat's OSCQuery HTTP port over mDNS. Needs the optional zeroconf package."""
+    try:
+        from zeroconf import Zeroconf, ServiceBrowser
+    except ImportError:
+        return None
+    found = threading.Event()
+    result = {}
+
+    class Listener:
+        def add_service(self, zc, type_, name):
+            if name.startswith('VRChat-Client-'):
+                info = zc.get_service_info(type_, name)
+                if info:
+                    result['port'] = info.port
+                    found.set()
+
+        def update_service(self, zc, type_, name):
+            pass
+
+        def remove_service(self, zc, type_, name):
+            pass
+
+    zc = Zeroconf()
+    try:
+        ServiceBrowser(zc, '_oscjson._tcp.local.', Listener())
+        found.wait(timeout)
+    finally:
+        zc.close()
+    return result.get('port')
+
+
+class OSCQueryClient:
+    """
+    Reads the avatar tree from VRChat's OSCQuery server. Without a fixed port the
+    port is discovered over mDNS and forgotten again when it stops answering, since
+    VRChat picks a new one every time it starts.
+    """
+
+    def __init__(self, host='127.0.0.1', port=None, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.fixed_port = bool(port)
+        self.timeout = timeout
+
+    def fetch_avatar(self):
+        """Return (avatar_id, params) from the running client's /avatar node."""
+        rediscovered = False
+        while True:
+            if not self.port:
+                self.port = discover_oscquery_port(self.timeout)
+                rediscovered = True
+                if not self.port:
+                    raise ConnectionError("OSCQuery port unknown (set oscquery_port or install zeroconf)")
+            url = f'http://{self.host}:{self.port}/avatar'
+            try:
+                with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                    return parse_oscquery_tree(json.loads(resp.read().decode('utf-8')))
+            except OSError:
+                # URLError and timeouts are OSErrors; VRChat may have restarted on another port
+                if self.fixed_port:
+                    raise
+                self.port = None
+                if rediscovered:
+                    raise
+
+
+class AvatarParamResolver:
+    """
+    Parameter schemas per avatar ID, cached in memory and in CACHE_FILE.
+
+    resolve() never blocks: a cached schema is handed to the callback right away,
+    and the network / filesystem lookup runs on a worker thread. It is only done
+    when the avatar changes; its result is delivered again only if it differs.
+    callback(avatar_id, params, source) may be called from the worker thread.
+    """
+
+    def __init__(self, client=None, cache_file=CACHE_FILE, config_root=None):
+        self.client = client
+        self.cache_file = cache_file
+        self.config_root = config_root
+        self._lock = threading.Lock()
+        try:
+            with open(cache_file) as f: self.cache = json.load(f)
+        except: self.cache = {}
+
+    def resolve(self, avatar_id, callback):
+        cached = self.cache.get(avatar_id)
+        if cached is not None:
+            callback(avatar_id, cached, 'cache')
+        threading.Thread(target=self._refresh, args=(avatar_id, cached, callback), daemon=True, name="oscquery").start()
+
+    def lookup(self, avatar_id):
+        """Blocking lookup: OSCQuery first, then VRChat's config file. Returns (params, source)."""
+        errors = []
+        if self.client is not None:
+            try:
+                live_id, params = self.client.fetch_avatar()
+                if params and (live_id is None or live_id == avatar_id):
+                    return params, 'oscquery'
+                errors.append(f"OSCQuery reports avatar {live_id}")
+            except Exception as e:
+                errors.append(f"OSCQuery: {e}")
+        try:
+            return load_avatar_config_file(avatar_id, self.config_root), 'file'
+        except Exception as e:
+            errors.append(f"config file: {e}")
+        raise LookupError('; '.join(errors))
+
+    def _refresh(self, avatar_id, cached, callback):
+        try:
+            params, source = self.lookup(avatar_id)
+        except LookupError as e:
+            if cached is None:
+                callback(avatar_id, None, str(e))
+            return
+        if params == cached:
+            return
+        with self._lock:
+            self.cache[avatar_id] = params
+            try:
+                with open(self.cache_file, 'w') as f: json.dump(self.cache, f)
+            except OSError as e:
+                print(f"Could not write {self.cache_file}: {e}")
+        callback(avatar_id, params, source)
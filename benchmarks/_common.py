@@ -0,0 +1,29 @@
+# benchmarks/_common.py
+"""Synthetic data shared by the benchmarks."""
+import random
+
+WORDS = ("red blue green hat glasses coat jump wave dance lights on off toggle "
+         "left right tail ears wings sparkle shadow mode big small").split()
+
+
+def synthetic_commands(n, seed=1):
+    """n commands with a mix of exact, in-sentence and slot phrases and all action kinds."""
+    rnd = random.Random(seed)
+    commands = []
+    for i in range(n):
+        phrase = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 4))) + f" {i}"
+        actions = [{'path': f'/avatar/parameters/P{i % 256}', 'value': (i % 7) / 7, 'toggle': i % 5 == 0,
+                    'delay': 0, 'action_type': 'OSC'}]
+        if i % 10 == 0:
+            phrase += " {n:number}"
+            actions[0]['value'] = "{n}"
+        if i % 4 == 0:
+            actions.append({'path': f'done {i}', 'delay': 0.5, 'action_type': 'Chatbox'})
+        commands.append({
+            'phrase': phrase,
+            'actions': actions,
+            'enabled': True,
+            'scope': 'global' if i % 8 else 'avtr_bench',
+            'in_sentence': i % 3 == 0,
+        })
+    return commands
@@ -0,0 +1,50 @@
+# benchmarks/bench_endpointing.py
+"""
+Speech end to final result per endpointing profile, on a recorded clip.
+
+    python benchmarks/bench_endpointing.py clip.wav [model_path]
+
+clip.wav is 16 kHz mono 16-bit speech, e.g. a black box export. It is decoded
+offline once per profile with two seconds of silence appended; the latency is
+how much trailing audio the endpointer needed (decode time is not included).
+More finals than under dictation means a sentence got cut in pieces.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import metrics
+from audio_source import FileAudioSource, SAMPLE_RATE, BLOCK_SIZE
+from voice import VoiceRecognizer, ENDPOINT_PROFILES
+from vosk_json import final_text
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    clip = sys.argv[1]
+    model_path = sys.argv[2] if len(sys.argv) > 2 else "models/vosk-model-small-en-us-0.15"
+    blocks = list(FileAudioSource(clip).blocks())
+    blocks += [bytes(BLOCK_SIZE * 2)] * int(2 * SAMPLE_RATE / BLOCK_SIZE)
+
+    voice = None
+    for name in ENDPOINT_PROFILES:
+        finals = []
+        if voice is None:
+            voice = VoiceRecognizer(finals.append, lambda partial: None, model_path=model_path, wake_level=800)
+        else:
+            voice.callback = finals.append
+            voice.recognizer.Reset()
+        voice.set_endpointing(name)
+        for block in blocks:
+            voice.handle_block(block)
+        tail = final_text(voice.recognizer.FinalResult())
+        h = metrics.endpoint_latency(name)
+        print(f"{name:<10} finals {len(finals):3d}  speech end -> final avg {h.mean() * 1000:7.1f} ms"
+              f"  p95 {h.quantile(0.95) * 1000:7.1f} ms" + (f"  (left over: {tail})" if tail else ""))
+        for text in finals:
+            print(f"           {text}")
+
+
+if __name__ == "__main__":
+    main()
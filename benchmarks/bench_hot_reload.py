@@ -0,0 +1,88 @@
+# benchmarks/bench_hot_reload.py
+"""
+Apply time of a commands.json hot reload with 5,000 commands.
+
+    python benchmarks/bench_hot_reload.py [count]
+
+Measures the cold compile, an incremental reload where a handful of commands
+were edited, and matching against the compiled set. The reload is timed the
+way the window does it (MainWindow._reload_commands): parse, update the
+CommandSet and rebuild the command list widgets. Without PyQt5 the widget
+rebuild is left out, and the output says so.
+"""
+import os
+import sys
+import json
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from commands import CommandSet, load_commands
+from _common import synthetic_commands
+
+def widget_rebuild():
+    """MainWindow._populate_cmd_list on an offscreen list widget, or None without PyQt5."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication, QListWidget
+        import gui
+    except ImportError as e:
+        print(f"(widget rebuild not measured: {e})")
+        return None
+    app = QApplication.instance() or QApplication([])
+    win = SimpleNamespace(cmd_list=QListWidget(), command_data=[], current_avatar_id=None)
+
+    def populate(commands):
+        win.command_data = commands
+        gui.MainWindow._populate_cmd_list(win)
+        app.processEvents()
+    return populate
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = {'mappings': synthetic_commands(n)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'commands.json')
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+        commands, load_ms = timed(lambda: load_commands(path))
+        cset, cold_ms = timed(lambda: CommandSet(commands))
+
+        # a user edits 10 phrases by hand and saves
+        for m in data['mappings'][:: n // 10][:10]:
+            m['phrase'] += " edited"
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+        populate = widget_rebuild()
+
+        def reload():
+            cmds = load_commands(path, strict=True)
+            counts = cset.update(cmds)
+            if populate is not None:
+                populate(cmds)
+            return counts
+        (compiled, reused), reload_ms = timed(reload)
+
+        phrase = data['mappings'][n // 2 + 1]['phrase']  # +1: every tenth has a slot
+        _, match_ms = timed(lambda: [list(cset.matches(phrase)) for _ in range(100)])
+
+    print(f"{n} commands")
+    print(f"parse commands.json     {load_ms:8.2f} ms")
+    print(f"cold compile            {cold_ms:8.2f} ms")
+    what = "parse+apply+widgets" if populate is not None else "parse+apply, no widgets"
+    print(f"hot reload              {reload_ms:8.2f} ms  ({what}; {compiled} recompiled, {reused} reused)")
+    print(f"match one utterance     {match_ms / 100:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_idle_unload.py
+"""
+Resident memory before/after an idle unload and the warm reload time.
+
+Drives VoiceRecognizer.handle_block() with synthetic audio, so no microphone is needed:
+    python benchmarks/bench_idle_unload.py [model_path]
+"""
+import os
+import sys
+import time
+import math
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from voice import VoiceRecognizer, BLOCK_SIZE, SAMPLE_RATE
+
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def block(amplitude, offset=0):
+    samples = array('h', (
+        int(amplitude * math.sin(2 * math.pi * 440 * (offset + i) / SAMPLE_RATE)) for i in range(BLOCK_SIZE)
+    ))
+    return samples.tobytes()
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "models/vosk-model-small-en-us-0.15"
+    base = rss_mb()
+    voice = VoiceRecognizer(lambda t: None, lambda t: None, model_path=model_path, idle_unload_s=0.5)
+    print(f"initial load        {voice.last_reload_s:8.2f} s")
+    silence = block(0)
+    for _ in range(10):
+        voice.handle_block(silence)  # warm up the decoder
+    loaded = rss_mb()
+
+    time.sleep(0.6)
+    voice.handle_block(silence)  # idle timeout passes on this block
+    if voice.loaded:
+        sys.exit("FAIL: the model is still loaded after the idle timeout")
+    unloaded = rss_mb()
+
+    # loud block wakes the model, keep feeding while it reloads in the background
+    t0 = time.perf_counter()
+    voice.handle_block(block(8000))
+    fed = 1
+    while not voice.loaded:
+        time.sleep(BLOCK_SIZE / SAMPLE_RATE)
+        voice.handle_block(block(8000, fed * BLOCK_SIZE))
+        fed += 1
+    wake = time.perf_counter() - t0
+
+    print(f"RSS baseline        {base:8.1f} MB")
+    print(f"RSS model loaded    {loaded:8.1f} MB")
+    print(f"RSS after unload    {unloaded:8.1f} MB  ({loaded - unloaded:+.1f} MB released)")
+    print(f"reload (loader)     {voice.last_reload_s:8.2f} s")
+    print(f"wake to first decode{wake:8.2f} s, {fed} blocks buffered and replayed")
+
+
+if __name__ == "__main__":
+    main()
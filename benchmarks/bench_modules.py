@@ -0,0 +1,106 @@
+# benchmarks/bench_modules.py
+"""
+Module pipeline under a slow module, no microphone or model needed.
+
+    python benchmarks/bench_modules.py [utterances] [--slow-ms 300]
+
+Feeds partials and finals at speaking pace to a fast module (the real
+ChatboxRelay with a no-op send) and a deliberately slow one. Checks that
+handing results over stays in the microseconds, that the chatbox keeps up
+while the slow module lags, that the slow module still gets the last final,
+and that its stale partials are coalesced instead of queued. Exits non-zero
+on failure.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import metrics
+from metrics import now
+from modules.chatbox import ChatboxRelay
+from modules.pipeline import Module, ModulePipeline
+
+PARTIAL_EVERY_S = 0.02
+PARTIALS_PER_UTTERANCE = 10
+
+
+class SlowModule(Module):
+    name = "slow"
+    queue_size = 4
+    budget_s = 0.05
+
+    def __init__(self, delay_s):
+        self.delay_s = delay_s
+        self.finals = []
+        self.partials = 0
+
+    def on_final(self, text):
+        time.sleep(self.delay_s)
+        self.finals.append(text)
+
+    def on_partial(self, text):
+        time.sleep(self.delay_s / 4)
+        self.partials += 1
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('utterances', nargs='?', type=int, default=20)
+    ap.add_argument('--slow-ms', type=float, default=300)
+    args = ap.parse_args()
+
+    sent = []
+    chatbox = ChatboxRelay({'stt_mode': 'ON', 'stt_activation__phrase': '', 'send_confirm': 'LIVE'},
+                           lambda path, value: sent.append(value))
+    slow = SlowModule(args.slow_ms / 1000)
+    pipeline = ModulePipeline([chatbox, slow])
+
+    handoff = metrics.Histogram()
+    t_start = now()
+    last = None
+    for u in range(args.utterances):
+        words = [f"word{u}_{i}" for i in range(PARTIALS_PER_UTTERANCE)]
+        for i in range(1, len(words) + 1):
+            t0 = now()
+            pipeline.partial(" ".join(words[:i]))
+            handoff.since(t0)
+            time.sleep(PARTIAL_EVERY_S)
+        last = " ".join(words)
+        t0 = now()
+        pipeline.final(last)
+        handoff.since(t0)
+    fed_s = now() - t_start
+
+    deadline = time.monotonic() + 10
+    while slow.finals[-1:] != [last] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = pipeline.stats()
+    pipeline.stop()
+
+    print(f"fed {args.utterances} utterances in {fed_s:.2f} s, hand-off avg {handoff.mean() * 1e6:.1f} us"
+          f"  p95 {handoff.quantile(0.95) * 1e6:.1f} us")
+    for name, s in stats.items():
+        print(f"{name:<8} final avg {s['final_ms']:7.1f} ms  partial avg {s['partial_ms']:7.1f} ms  "
+              f"coalesced {s['coalesced']:4d}  dropped {s['dropped']:3d}  over budget {s['over_budget']:3d}")
+    print(f"chatbox sent {len(sent)} messages, slow module saw {len(slow.finals)} finals, {slow.partials} partials")
+
+    failures = []
+    if handoff.quantile(0.95) > 0.001:
+        failures.append("handing a result to the modules took over a millisecond")
+    if stats['chatbox']['dropped'] or stats['chatbox']['over_budget']:
+        failures.append("the chatbox was held up by the slow module")
+    if sent[-1:] != [[last, True, True]]:
+        failures.append(f"chatbox ended on {sent[-1:]!r}, expected the last final")
+    if slow.finals[-1:] != [last]:
+        failures.append("the slow module never got the last final")
+    if not stats['slow']['coalesced']:
+        failures.append("no partials were coalesced for the slow module")
+    for f in failures:
+        print(f"FAIL: {f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
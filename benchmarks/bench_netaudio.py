@@ -0,0 +1,155 @@
+# benchmarks/bench_netaudio.py
+"""
+Remote audio over localhost, no microphone or model needed.
+
+    python benchmarks/bench_netaudio.py [blocks] [--loss 0.03] [--reorder 0.05]
+
+Streams numbered blocks from AudioStreamClient to a NetworkAudioSource through
+an impairment step that drops, reorders, duplicates and delays packets, for
+UDP and TCP with PCM and mu-law. Checks that the decoder side gets every block
+slot in order (lost ones as silence), that mu-law stays within its quantization
+error, and reports loss, jitter and network latency. Exits non-zero on failure.
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import threading
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import metrics
+from audio_source import SAMPLE_RATE, BLOCK_SIZE
+from netaudio import AudioStreamClient, NetworkAudioSource, ulaw_encode, ulaw_decode
+
+BLOCK_S = BLOCK_SIZE / SAMPLE_RATE
+
+
+def block(n):
+    """A 440 Hz tone whose first sample carries the block number."""
+    samples = array('h', (int(8000 * math.sin(2 * math.pi * 440 * (n * BLOCK_SIZE + i) / SAMPLE_RATE))
+                          for i in range(BLOCK_SIZE)))
+    samples[0] = n % 32768
+    return samples.tobytes()
+
+
+def ulaw_error():
+    pcm = array('h', range(-32768, 32768, 7)).tobytes()
+    back = array('h', ulaw_decode(ulaw_encode(pcm)))
+    worst = 0.0
+    for a, b in zip(array('h', pcm), back):
+        if abs(a) > 64:
+            worst = max(worst, abs(a - b) / abs(a))
+    return worst
+
+
+class Impaired:
+    """Sits in front of send_block and misbehaves like a busy Wi-Fi link."""
+
+    def __init__(self, client, loss, reorder, dup, rnd):
+        self.client = client
+        self.loss, self.reorder, self.dup = loss, reorder, dup
+        self.rnd = rnd
+        self.held = None
+
+    def send(self, pcm):
+        seq = self.client.seq
+        if self.rnd.random() < self.loss:
+            self.client.seq += 1  # the packet never makes it
+            return
+        if self.held is None and self.rnd.random() < self.reorder:
+            # send this one after the next
+            self.held = (seq, pcm)
+            self.client.seq += 1
+            return
+        self.client.send_block(pcm)
+        if self.held is not None:
+            held_seq, held_pcm = self.held
+            self.held = None
+            next_seq = self.client.seq
+            self.client.seq = held_seq
+            self.client.send_block(held_pcm)
+            self.client.seq = next_seq
+        if self.rnd.random() < self.dup:
+            self.client.seq = seq
+            self.client.send_block(pcm)
+
+
+def run(transport, codec, blocks, loss, reorder, pace):
+    got = []
+    done = threading.Event()
+
+    def put(pcm):
+        got.append(pcm)
+        if len(got) >= blocks:
+            done.set()
+
+    for h in metrics.stage.values():
+        h.__init__()
+    source = NetworkAudioSource(port=0, host='127.0.0.1', transport=transport, max_wait_ms=40)
+    source.start(put)
+    client = AudioStreamClient('127.0.0.1', source.port, transport, codec)
+    if transport == 'tcp':
+        loss = reorder = 0  # TCP delivers everything in order; only the latency is of interest
+    impaired = Impaired(client, loss, reorder, 0.01 if transport == 'udp' else 0, random.Random(7))
+    next_at = time.monotonic()
+    for n in range(blocks + 4):  # a few extra so a loss at the very end still shows up as a gap
+        impaired.send(block(n))
+        next_at += pace
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    done.wait(2)
+    time.sleep(0.1)
+    stats = source.stats()
+    client.close()
+    source.stop()
+
+    failures = []
+    if len(got) < blocks:
+        failures.append(f"{len(got)} of {blocks} block slots delivered")
+    silent = 0
+    for n, pcm in enumerate(got):
+        first = array('h', pcm[:2])[0]
+        if not any(pcm):
+            silent += 1
+        elif codec == 'pcm' and first != n % 32768:
+            failures.append(f"slot {n} holds block {first}")
+            break
+    if silent != stats['lost']:
+        failures.append(f"{silent} silent slots but {stats['lost']} reported lost")
+    return stats, failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('blocks', type=int, nargs='?', default=200)
+    ap.add_argument('--loss', type=float, default=0.03)
+    ap.add_argument('--reorder', type=float, default=0.05)
+    ap.add_argument('--realtime', action='store_true', help=f"send a block every {BLOCK_S * 1000:.0f} ms instead of 10x faster")
+    args = ap.parse_args()
+    pace = BLOCK_S if args.realtime else BLOCK_S / 10
+
+    failed = False
+    worst = ulaw_error()
+    print(f"mu-law worst relative error {worst:.1%}")
+    if worst > 0.07:
+        print("FAIL: mu-law round trip too lossy"); failed = True
+    for transport in ('udp', 'tcp'):
+        for codec in ('pcm', 'ulaw'):
+            stats, failures = run(transport, codec, args.blocks, args.loss, args.reorder, pace)
+            print(f"{transport} {codec:<4}  received {stats['received']:4d}  lost {stats['lost']:3d}  "
+                  f"late {stats['late']:2d}  dup {stats['duplicate']:2d}  reordered {stats['reordered']:2d}  "
+                  f"jitter {stats['jitter_ms']:6.2f} ms  network p50 {stats['latency_p50_ms']:6.2f} ms  "
+                  f"p95 {stats['latency_p95_ms']:6.2f} ms")
+            for f in failures:
+                print(f"  FAIL: {f}")
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_oscquery.py
+"""
+Avatar parameter discovery against a local stand-in OSCQuery server.
+
+    python benchmarks/bench_oscquery.py [param_count]
+
+Reports a cold OSCQuery fetch, the time resolve() takes to hand a cached schema
+back (what opening the command editor after an avatar switch costs), and the
+fallback to VRChat's config file when OSCQuery is unreachable. Exits non-zero
+when one of them doesn't behave.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from avatar_params import AvatarParamResolver, OSCQueryClient
+
+TYPES = ('f', 'i', 'T')
+
+
+def avatar_tree(avatar_id, count):
+    """An /avatar node shaped like VRChat's OSCQuery answer."""
+    params = {}
+    for i in range(count):
+        name = f'Param{i}'
+        params[name] = {
+            'FULL_PATH': f'/avatar/parameters/{name}',
+            'ACCESS': 3,
+            'TYPE': TYPES[i % 3],
+            'VALUE': [0],
+        }
+    return {
+        'FULL_PATH': '/avatar',
+        'ACCESS': 0,
+        'CONTENTS': {
+            'change': {'FULL_PATH': '/avatar/change', 'ACCESS': 3, 'TYPE': 's', 'VALUE': [avatar_id]},
+            'parameters': {'FULL_PATH': '/avatar/parameters', 'ACCESS': 0, 'CONTENTS': params},
+        },
+    }
+
+
+class StandInOSCQuery:
+    """Serves a fixed /avatar tree on localhost, counting requests."""
+
+    def __init__(self, avatar_id, count):
+        body = json.dumps(avatar_tree(avatar_id, count)).encode('utf-8')
+        outer = self
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                outer.requests += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def resolve_blocking(resolver, avatar_id):
+    got = []
+    done = threading.Event()
+
+    def callback(aid, params, source):
+        got.append((params, source))
+        done.set()
+    t0 = time.perf_counter()
+    resolver.resolve(avatar_id, callback)
+    first = time.perf_counter() - t0 if got else None
+    done.wait(5)
+    return got, first
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    avatar = 'avtr_00000000-0000-0000-0000-000000000001'
+    server = StandInOSCQuery(avatar, count)
+    failures = []
+
+    def check(ok, what):
+        if not ok:
+            failures.append(what)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, 'cache.json')
+        client = OSCQueryClient(port=server.port)
+
+        t0 = time.perf_counter()
+        _, params = client.fetch_avatar()
+        cold = time.perf_counter() - t0
+        check(len(params) == count, f"OSCQuery fetch returned {len(params)} parameters, expected {count}")
+
+        resolver = AvatarParamResolver(client, cache_file=cache, config_root=tmp)
+        got, _ = resolve_blocking(resolver, avatar)
+        check(got and got[0][1] == 'oscquery', f"first resolve came from {got[0][1] if got else 'nowhere'}, expected oscquery")
+
+        # switching back to a known avatar: the cached schema comes back synchronously
+        resolver = AvatarParamResolver(client, cache_file=cache, config_root=tmp)
+        got, cached = resolve_blocking(resolver, avatar)
+        check(got and got[0][1] == 'cache' and len(got[0][0]) == count, "known avatar wasn't served from the cache")
+        time.sleep(0.2)
+        check(len(got) == 1, "unchanged schema was delivered twice")
+
+        # OSCQuery gone: fall back to the config file VRChat writes
+        server.close()
+        user = os.path.join(tmp, 'usr_test', 'Avatars')
+        os.makedirs(user)
+        with open(os.path.join(user, 'avtr_fallback.json'), 'w', encoding='utf-8-sig') as f:
+            json.dump({'parameters': [{'input': {'address': '/avatar/parameters/A', 'type': 'Bool'}}]}, f)
+        resolver = AvatarParamResolver(OSCQueryClient(port=server.port, timeout=0.2),
+                                       cache_file=cache, config_root=tmp)
+        got, _ = resolve_blocking(resolver, 'avtr_fallback')
+        fallback = bool(got) and got[0][1] == 'file'
+        check(fallback, f"no config file fallback without OSCQuery: {got}")
+
+    print(f"{count} parameters")
+    print(f"cold OSCQuery fetch   {cold * 1000:8.2f} ms")
+    print("cached resolve        " + (f"{cached * 1000:8.3f} ms" if cached is not None else "       -"))
+    print("file fallback         " + ("ok" if fallback else "FAILED"))
+    for f in failures:
+        print(f"FAIL: {f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
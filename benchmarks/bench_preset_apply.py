@@ -0,0 +1,159 @@
+# benchmarks/bench_preset_apply.py
+"""
+First a deterministic check: PacedSender gets a 256 parameter preset right
+after a stale send_many() it replaces, at the given rate and at rate 0, and
+must hand a recording sender exactly the parameters that differ, once each and
+in order, in bundles of at most `batch`.
+
+Then the delivery part: the preset goes to a local OSC receiver while other
+traffic floods it, once unpaced (a send() per parameter, for comparison) and
+once through PacedSender, which must get all 256 parameters through. A paced
+run that loses some is retried up to PACED_ATTEMPTS times, so a one-off
+scheduling hiccup on a busy machine doesn't fail it but a real regression does.
+Either part failing exits non-zero.
+
+    python benchmarks/bench_preset_apply.py [rate] [batch]
+"""
+import os
+import sys
+import time
+import socket
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pythonosc.osc_packet import OscPacket
+from osc_sender import OSCSender, PacedSender
+from presets import changed_params
+
+PARAMS = 256
+PACED_ATTEMPTS = 3
+
+
+class Receiver:
+    """Counts distinct preset addresses, with a small socket buffer like a busy game client."""
+
+    def __init__(self, rcvbuf=16384):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.seen = {}
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                data, _ = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            for timed in OscPacket(data).messages:
+                msg = timed.message
+                if msg.address.startswith("/avatar/parameters/Preset"):
+                    self.seen[msg.address] = msg.params[0]
+            time.sleep(0.0002)  # the game only drains its socket so fast
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+
+def flood(port, stop, per_second=2000):
+    # steady background traffic, roughly what a moving avatar produces
+    sender = OSCSender("127.0.0.1", port)
+    interval = 1.0 / per_second
+    next_at = time.monotonic()
+    while not stop.is_set():
+        sender.send("/avatar/parameters/VelocityX", 0.5)
+        next_at += interval
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run(apply):
+    rx = Receiver()
+    stop = threading.Event()
+    noise = threading.Thread(target=flood, args=(rx.port, stop), daemon=True)
+    noise.start()
+    preset = {f"/avatar/parameters/Preset{i}": (i % 7) / 7 for i in range(PARAMS)}
+    items = changed_params(preset, {})
+    t0 = time.perf_counter()
+    apply(OSCSender("127.0.0.1", rx.port), items)
+    elapsed = time.perf_counter() - t0
+    time.sleep(0.3)
+    stop.set(); noise.join()
+    rx.close()
+    return len(rx.seen), elapsed
+
+
+class RecordingSender:
+    """Stands in for OSCSender and keeps every bundle instead of sending it."""
+
+    def __init__(self):
+        self.bundles = []
+
+    def send_bundle(self, items):
+        self.bundles.append(list(items))
+
+
+def check(rate, batch):
+    """Problems found with what PacedSender sends, [] when it is right."""
+    problems = []
+    preset = {f"/avatar/parameters/Preset{i}": (i % 7) / 7 for i in range(PARAMS)}
+    current = {addr: value for i, (addr, value) in enumerate(preset.items()) if i % 4 == 0}
+    expected = changed_params(preset, current)
+    for r in (rate, 0):
+        rec = RecordingSender()
+        ps = PacedSender(rec, rate=r, batch=batch)
+        ps.send_many([("/avatar/parameters/Stale", 1.0)] * 3)  # replaced before or while it goes out
+        ps.send_many(expected)
+        if not ps.wait(timeout=PARAMS / batch / max(r, 1) + 5):
+            problems.append(f"rate {r:g}: not done in time")
+            continue
+        sent = [item for bundle in rec.bundles for item in bundle if item[0] != "/avatar/parameters/Stale"]
+        if sent != expected:
+            problems.append(f"rate {r:g}: sent {len(sent)} parameters, expected the {len(expected)} that differ, in order")
+        if any(len(b) > batch for b in rec.bundles):
+            problems.append(f"rate {r:g}: a bundle had more than {batch} parameters")
+    return problems
+
+
+def unpaced(sender, items):
+    for path, value in items:
+        sender.send(path, value)
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    def paced(sender, items):
+        ps = PacedSender(sender, rate=rate, batch=batch)
+        ps.send_many(items)
+        ps.wait()
+
+    problems = check(rate, batch)
+    print("PacedSender sends the right parameters: " + ("yes" if not problems else "NO"))
+    for p in problems:
+        print(f"FAIL: {p}")
+
+    got, elapsed = run(unpaced)
+    print(f"unpaced      {got:4d}/{PARAMS} received in {elapsed * 1000:7.1f} ms")
+    for attempt in range(1, PACED_ATTEMPTS + 1):
+        got, elapsed = run(paced)
+        print(f"paced {rate:g}/s x{batch} {got:4d}/{PARAMS} received in {elapsed * 1000:7.1f} ms"
+              + (f"  (attempt {attempt})" if attempt > 1 else ""))
+        if got == PARAMS:
+            break
+    else:
+        problems.append(f"paced preset lost {PARAMS - got} parameters in each of {PACED_ATTEMPTS} runs")
+        print(f"FAIL: {problems[-1]}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
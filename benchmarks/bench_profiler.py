@@ -0,0 +1,96 @@
+# benchmarks/bench_profiler.py
+"""
+CPROFILE mode starts and produces output on this Python, both ways it can run.
+
+    python benchmarks/bench_profiler.py
+
+Mimics the app: a wrapped long-running thread (the voice loop) starts first,
+then the wrapped main loop runs and OSC handlers are called through
+wrap_handler() on short-lived threads. Runs once with one process-wide profile
+(what Python 3.12+ needs, since it allows a single cProfile per process) and,
+before 3.12, once with a profile per thread. Fails when anything raises or the
+work never shows up in a dump. Exits non-zero on failure.
+"""
+import os
+import sys
+import gzip
+import marshal
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiler import Profiler
+
+
+def voice_step():
+    return sum(range(2000))
+
+
+def busy_voice(stop):
+    # never returns before the dump, like the real voice loop; what it calls does
+    while not stop.is_set():
+        voice_step()
+        stop.wait(0.001)
+
+
+def busy_gui():
+    return sum(i * i for i in range(200000))
+
+
+def busy_handler(address, value):
+    return sorted(range(5000), reverse=True)
+
+
+def profiled_functions(out_dir):
+    names = set()
+    for n in os.listdir(out_dir):
+        if n.startswith("cprofile-"):
+            with gzip.open(os.path.join(out_dir, n), "rb") as f:
+                names.update(func for _, _, func in marshal.loads(f.read()))
+    return names
+
+
+def run(process_wide):
+    failures = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        p = Profiler().configure("CPROFILE", out_dir=out_dir, tracemalloc_interval=0)
+        p.process_wide = process_wide
+        stop = threading.Event()
+        try:
+            p.start()
+            voice = threading.Thread(target=p.wrap(busy_voice, "voice"), args=(stop,), daemon=True)
+            voice.start()
+            p.wrap(busy_gui, "gui")()
+            handler = p.wrap_handler(busy_handler, "osc")
+            for _ in range(3):
+                t = threading.Thread(target=handler, args=("/avatar/parameters/X", 1))
+                t.start(); t.join()
+        except Exception as e:
+            failures.append(f"raised {type(e).__name__}: {e}")
+        finally:
+            stop.set()
+            p.stop()
+        found = profiled_functions(out_dir)
+        # a process-wide profile sees every thread only from 3.12 on
+        expected = {"busy_gui", "busy_handler", "voice_step"}
+        if process_wide and sys.version_info < (3, 12):
+            expected = {"busy_gui"}
+        for func in sorted(expected - found):
+            failures.append(f"{func} is missing from the dumps")
+    label = "process-wide" if process_wide else "per thread"
+    print(f"{label:<13} " + ("ok" if not failures else "FAIL"))
+    return [f"{label}: {f}" for f in failures]
+
+
+def main():
+    print(f"Python {sys.version.split()[0]}")
+    failures = run(process_wide=True)
+    if sys.version_info < (3, 12):
+        failures += run(process_wide=False)
+    for f in failures:
+        print(f"FAIL: {f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# benchmarks/run.py
+"""
+Microbenchmarks for the dispatch hot paths. Needs no audio device, Qt or VRChat.
+
+    python benchmarks/run.py [--filter text] [--out file.json]
+                             [--baseline file.json] [--threshold 0.25]
+
+Every case is timed in loops of at least --min-time seconds, repeated --repeat
+times; the fastest loop is what gets compared, the median is kept for reference.
+Results are written to benchmarks/results/<timestamp>.json unless --out is given.
+With --baseline, a case that got slower by more than --threshold (0.25 = 25%)
+makes the run exit with status 1.
+
+Cases whose dependency is not installed (python-osc) are reported as skipped.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from commands import CommandSet, match_execution_criteria, parse_value
+from avatar_params import AvatarParamResolver
+from vosk_json import final_text, partial_text
+from _common import WORDS, synthetic_commands
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+COMMAND_COUNTS = (10, 100, 1000, 10000)
+AVATAR_PARAM_COUNTS = (256, 4096)
+TYPES = ('Float', 'Int', 'Bool')
+
+
+class Skip(Exception):
+    pass
+
+
+def utterances(commands, seed=2):
+    """What the recognizer hands over: hits, hits inside a sentence, slot fills and misses."""
+    rnd = random.Random(seed)
+    picked = [rnd.choice(commands)['phrase'] for _ in range(8)]
+    said = [p.replace("{n:number}", "forty two") for p in picked]
+    said += [f"could you {s} please" for s in said[:4]]
+    said += ["this sentence matches nothing at all", "hello there"]
+    return said
+
+
+def measure(fn, min_time, repeat):
+    """Per-call seconds: (fastest loop, median loop, calls per loop)."""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed * 1.2) + 1))
+    runs = [elapsed]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        runs.append(time.perf_counter() - t0)
+    return min(runs) / loops, statistics.median(runs) / loops, loops
+
+
+# -- cases ------------------------------------------------------------------
+# each yields (name, fn); the setup they do is not timed
+
+def case_match_criteria():
+    for n in COMMAND_COUNTS:
+        commands = synthetic_commands(n)
+        said = utterances(commands)
+
+        def run(commands=commands, said=said):
+            for phrase in said:
+                for cmd in commands:
+                    match_execution_criteria(phrase, cmd['phrase'], cmd['in_sentence'])
+        yield f"match_execution_criteria[{n}]", run
+
+
+def case_dispatch():
+    param_values = {f'/avatar/parameters/P{i}': 0.0 for i in range(256)}
+    param_types = {p: TYPES[i % 3] for i, p in enumerate(param_values)}
+    for n in COMMAND_COUNTS:
+        commands = synthetic_commands(n)
+        cset = CommandSet(commands)
+        said = utterances(commands)
+
+        def run(cset=cset, said=said):
+            for phrase in said:
+                cset.dispatch(phrase, 'avtr_bench', param_values, param_types)
+        yield f"dispatch[{n}]", run
+
+
+def case_parse_value():
+    cells = ["0.5", "1", "-3", "true", "False", "{n}", "hello", "", "1e-3", "255"] * 10
+
+    def run():
+        for vs in cells:
+            parse_value(vs)
+    yield "parse_value[100]", run
+
+
+def case_osc_send():
+    try:
+        from osc_sender import OSCSender
+    except ImportError as e:
+        raise Skip(f"python-osc not installed ({e})")
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))  # never read; the kernel drops what does not fit
+    sender = OSCSender("127.0.0.1", sink.getsockname()[1])
+    values = [0.25, 3, True, False, "text"]
+
+    def run():
+        for v in values:
+            sender.send("/avatar/parameters/Bench", v)
+    yield "osc_send[5]", run
+
+    items = [(f"/avatar/parameters/P{i}", (i % 7) / 7) for i in range(8)]
+    yield "osc_send_bundle[8]", lambda: sender.send_bundle(items)
+
+
+def case_vosk_json():
+    words = " ".join(WORDS[:12])
+    final = json.dumps({"text": words})
+    final_words = json.dumps({
+        "result": [{"conf": 1.0, "start": i * 0.3, "end": i * 0.3 + 0.25, "word": w}
+                   for i, w in enumerate(words.split())],
+        "text": words,
+    }, indent=2)
+    partial = json.dumps({"partial": words}, indent=2)
+
+    def run():
+        final_text(final)
+        final_text(final_words)
+        partial_text(partial)
+    yield "vosk_result_json[3]", run
+
+
+def case_avatar_config(tmp):
+    for n in AVATAR_PARAM_COUNTS:
+        avatar = f'avtr_bench_{n}'
+        folder = os.path.join(tmp, 'usr_bench', 'Avatars')
+        os.makedirs(folder, exist_ok=True)
+        config = {
+            'id': avatar,
+            'name': 'Bench',
+            'parameters': [
+                {'name': f'Param{i}',
+                 'input': {'address': f'/avatar/parameters/Param{i}', 'type': TYPES[i % 3]},
+                 'output': {'address': f'/avatar/parameters/Param{i}', 'type': TYPES[i % 3]}}
+                for i in range(n)
+            ],
+        }
+        with open(os.path.join(folder, f'{avatar}.json'), 'w', encoding='utf-8-sig') as f:
+            json.dump(config, f, indent=2)
+        # no OSCQuery client: lookup() goes straight to the config file, as it does offline
+        resolver = AvatarParamResolver(None, cache_file=os.path.join(tmp, 'cache.json'), config_root=tmp)
+        yield f"avatar_config_file[{n}]", lambda resolver=resolver, avatar=avatar: resolver.lookup(avatar)
+
+
+CASES = (case_match_criteria, case_dispatch, case_parse_value, case_osc_send, case_vosk_json)
+
+
+def run_cases(args, tmp):
+    results = {}
+    skipped = {}
+    for case in CASES + (lambda: case_avatar_config(tmp),):
+        try:
+            for name, fn in case():
+                if args.filter and args.filter not in name:
+                    continue
+                fastest, median, loops = measure(fn, args.min_time, args.repeat)
+                results[name] = {'min_us': fastest * 1e6, 'median_us': median * 1e6, 'loops': loops}
+                print(f"{name:32s} {fastest * 1e6:12.2f} us  (median {median * 1e6:.2f}, {loops} loops)")
+        except Skip as e:
+            skipped[case.__name__] = str(e)
+            print(f"{case.__name__:32s} skipped: {e}")
+    return results, skipped
+
+
+def compare(results, baseline, threshold):
+    """Names of the cases that regressed by more than threshold against baseline."""
+    regressed = []
+    for name, r in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = r['min_us'] / old['min_us'] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:32s} {old['min_us']:12.2f} -> {r['min_us']:12.2f} us  {change:+7.1%} {flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--filter', help="only run cases whose name contains this")
+    ap.add_argument('--out', help="result file (default: benchmarks/results/<timestamp>.json)")
+    ap.add_argument('--baseline', help="earlier result file to compare against")
+    ap.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    ap.add_argument('--min-time', type=float, default=0.05, help="seconds per timed loop")
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results, skipped = run_cases(args, tmp)
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'meta': {
+                'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'min_time': args.min_time,
+                'repeat': args.repeat,
+            },
+            'results': results,
+            'skipped': skipped,
+        }, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            sys.exit(f"FAIL: {len(regressed)} case(s) slower than {args.threshold:.0%} over baseline: "
+                     + ", ".join(regressed))
+
+
+if __name__ == "__main__":
+    main()
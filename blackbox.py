@@ -0,0 +1,234 @@
+# blackbox.py
+"""
+Rolling black box of what the recognizer heard, for reproducing misrecognitions.
+
+The last N minutes of decoded audio go into a fixed-size memory-mapped ring
+file together with an index of utterances (where each one starts and ends in
+the audio, and the Vosk result). Nothing is buffered in Python: blocks are
+written straight into the mapping and the OS writes the pages back, so the
+file survives a crash. "Save last utterance" exports a WAV clip and a JSON
+with the result, which replays offline:
+
+    python blackbox.py list [blackbox.ring]
+    python blackbox.py export [blackbox.ring] [--index -1] [--out blackbox]
+    python blackbox.py replay blackbox/utterance-20250101-120000.wav [--model path] [--commands commands.json]
+
+File layout: HEADER, INDEX_SLOTS index records, then the audio ring.
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import wave
+import struct
+import argparse
+import threading
+
+from audio_source import SAMPLE_RATE
+
+BLACKBOX_FILE = 'blackbox.ring'
+EXPORT_DIR = 'blackbox'
+MAGIC = b"VOSCBBX1"
+HEADER = struct.Struct("<8sIIQQQ")  # magic, sample rate, index slots, audio capacity, audio head, utterance count
+RECORD = struct.Struct("<QQdH")     # start, end (absolute audio bytes), wall time, result length
+RECORD_SIZE = 512
+RESULT_BYTES = RECORD_SIZE - RECORD.size
+INDEX_SLOTS = 256
+MAX_UTTERANCE_S = 30                # an utterance clip never reaches further back than this
+
+
+class BlackBox:
+    """
+    Ring file of the last `minutes` of audio fed to the decoder, plus an utterance index.
+
+    write() and add_utterance() are called from the voice thread; exports read
+    from any thread. Positions are absolute byte counts since the file was
+    created, so they stay valid across wrap-arounds until overwritten.
+    """
+
+    def __init__(self, path=BLACKBOX_FILE, minutes=5):
+        """minutes=None opens an existing file at whatever size it has."""
+        self.path = path
+        if minutes is None:
+            with open(path, 'rb') as f:
+                minutes = HEADER.unpack(f.read(HEADER.size))[3] / 2 / SAMPLE_RATE / 60
+        self.capacity = round(minutes * 60 * SAMPLE_RATE) * 2
+        self.audio_at = HEADER.size + INDEX_SLOTS * RECORD_SIZE
+        size = self.audio_at + self.capacity
+        self._lock = threading.Lock()  # index records, not audio
+        fresh = not os.path.isfile(path) or os.path.getsize(path) != size
+        with open(path, 'a+b') as f:
+            f.truncate(size)
+        self._file = open(path, 'r+b')
+        self.mm = mmap.mmap(self._file.fileno(), size)
+        if fresh or self.mm[:len(MAGIC)] != MAGIC:
+            HEADER.pack_into(self.mm, 0, MAGIC, SAMPLE_RATE, INDEX_SLOTS, self.capacity, 0, 0)
+        _, _, _, _, self.head, self.count = HEADER.unpack_from(self.mm, 0)
+
+    def _store_head(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, SAMPLE_RATE, INDEX_SLOTS, self.capacity, self.head, self.count)
+
+    @property
+    def position(self):
+        """Absolute byte position of the next block."""
+        return self.head
+
+    def write(self, data):
+        """Append one block; copies it into the mapping and nowhere else."""
+        n = len(data)
+        if n > self.capacity:
+            data = memoryview(data)[n - self.capacity:]
+            self.head += n - self.capacity
+            n = self.capacity
+        at = self.head % self.capacity
+        first = min(n, self.capacity - at)
+        base = self.audio_at
+        if first == n:
+            self.mm[base + at:base + at + n] = data
+        else:
+            view = memoryview(data)
+            self.mm[base + at:base + self.capacity] = view[:first]
+            self.mm[base:base + n - first] = view[first:]
+        self.head += n
+        self._store_head()
+
+    def add_utterance(self, start, end, result_json):
+        start = max(start, end - MAX_UTTERANCE_S * SAMPLE_RATE * 2, end - self.capacity)
+        result = result_json.encode('utf-8')
+        if len(result) > RESULT_BYTES:
+            # keep it valid JSON, the per-word details are what gets dropped
+            result = json.dumps({'text': json.loads(result_json).get('text', '')}).encode('utf-8')[:RESULT_BYTES]
+        with self._lock:
+            offset = HEADER.size + (self.count % INDEX_SLOTS) * RECORD_SIZE
+            RECORD.pack_into(self.mm, offset, start, end, time.time(), len(result))
+            self.mm[offset + RECORD.size:offset + RECORD.size + len(result)] = result
+            self.count += 1
+            self._store_head()
+
+    def utterances(self):
+        """Indexed utterances whose audio is still in the ring, oldest first."""
+        out = []
+        with self._lock:
+            for i in range(max(0, self.count - INDEX_SLOTS), self.count):
+                offset = HEADER.size + (i % INDEX_SLOTS) * RECORD_SIZE
+                start, end, wall, n = RECORD.unpack_from(self.mm, offset)
+                if start < self.head - self.capacity:
+                    continue  # audio already overwritten
+                raw = bytes(self.mm[offset + RECORD.size:offset + RECORD.size + n])
+                try:
+                    result = json.loads(raw.decode('utf-8'))
+                except ValueError:
+                    result = {'text': raw.decode('utf-8', errors='replace')}
+                out.append({'start': start, 'end': end, 'time': wall, 'result': result})
+        return out
+
+    def read(self, start, end):
+        """Audio between two absolute positions, as long as it hasn't been overwritten."""
+        start = max(start, self.head - self.capacity)
+        if end <= start:
+            return b""
+        at = start % self.capacity
+        n = end - start
+        base = self.audio_at
+        if at + n <= self.capacity:
+            return self.mm[base + at:base + at + n]
+        return self.mm[base + at:base + self.capacity] + self.mm[base:base + at + n - self.capacity]
+
+    def export(self, utterance, out_dir=EXPORT_DIR):
+        """Write utterance as WAV + JSON; returns the WAV path."""
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(utterance['time']))
+        base = os.path.join(out_dir, f'utterance-{stamp}')
+        n = 1
+        while os.path.exists(base + '.wav'):
+            n += 1
+            base = os.path.join(out_dir, f'utterance-{stamp}-{n}')
+        audio = self.read(utterance['start'], utterance['end'])
+        with wave.open(base + '.wav', 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(audio)
+        with open(base + '.json', 'w') as f:
+            json.dump({
+                'time': utterance['time'],
+                'duration_s': len(audio) / 2 / SAMPLE_RATE,
+                'result': utterance['result'],
+            }, f, indent=2)
+        return base + '.wav'
+
+    def export_last(self, out_dir=EXPORT_DIR):
+        utterances = self.utterances()
+        if not utterances:
+            return None
+        return self.export(utterances[-1], out_dir)
+
+    def close(self):
+        self.mm.flush()
+        self.mm.close()
+        self._file.close()
+
+
+def replay(wav_path, model_path, commands_path=None):
+    """Run a clip through a fresh recognizer; returns the texts it produced."""
+    from voice import VoiceRecognizer
+    from vosk_json import final_text
+    from audio_source import FileAudioSource
+    texts = []
+    voice = VoiceRecognizer(texts.append, lambda partial: None, model_path=model_path)
+    for block in FileAudioSource(wav_path).blocks():
+        voice.handle_block(block)
+    tail = final_text(voice.recognizer.FinalResult())
+    if tail:
+        texts.append(tail)
+    if commands_path:
+        from commands import CommandSet, load_commands
+        commands = CommandSet(load_commands(commands_path))
+        for text in texts:
+            for cmd, slots, actions in commands.dispatch(text, None, {}):
+                print(f"  '{text}' -> '{cmd['phrase']}' {slots or ''} {actions}")
+    return texts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect and replay the recognizer's black box.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('list')
+    p.add_argument('ring', nargs='?', default=BLACKBOX_FILE)
+    p = sub.add_parser('export')
+    p.add_argument('ring', nargs='?', default=BLACKBOX_FILE)
+    p.add_argument('--index', type=int, default=-1, help="which utterance, -1 is the last")
+    p.add_argument('--out', default=EXPORT_DIR)
+    p = sub.add_parser('replay')
+    p.add_argument('wav')
+    p.add_argument('--model', default="models/vosk-model-small-en-us-0.15")
+    p.add_argument('--commands', help="also show which commands the result triggers")
+    args = ap.parse_args()
+
+    if args.cmd == 'replay':
+        texts = replay(args.wav, args.model, args.commands)
+        print(f"Replayed:  {' | '.join(texts) or '(nothing recognized)'}")
+        sidecar = os.path.splitext(args.wav)[0] + '.json'
+        if os.path.isfile(sidecar):
+            with open(sidecar) as f: recorded = json.load(f)['result'].get('text', '')
+            print(f"Recorded:  {recorded}")
+            if recorded not in texts:
+                sys.exit(1)
+        return
+
+    box = BlackBox(args.ring, minutes=None)
+    utterances = box.utterances()
+    if args.cmd == 'list':
+        for i, u in enumerate(utterances):
+            when = time.strftime('%H:%M:%S', time.localtime(u['time']))
+            print(f"{i - len(utterances):4d}  {when}  {(u['end'] - u['start']) / 2 / SAMPLE_RATE:5.1f}s  {u['result'].get('text', '')}")
+    else:
+        if not utterances:
+            sys.exit("No utterances in the black box")
+        print(box.export(utterances[args.index], args.out))
+    box.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# commands.py
+import re
+import json
+from collections import namedtuple
+
+COMMANDS_FILE = 'commands.json'
+
+
+def normalize_command(m):
+    return {
+        'phrase': m.get('phrase', ''),
+        'actions': m.get('actions', []),
+        'enabled': m.get('enabled', True),
+        'scope': m.get('scope', 'global'),
+        'in_sentence': m.get('in_sentence', False)
+    }
+
+
+def load_commands(path=COMMANDS_FILE, strict=False):
+    """
+    strict=True is for hot reloads: a missing, half written or broken file
+    raises OSError / ValueError so the caller keeps what it has, instead of
+    getting an empty list it would save over the user's file.
+    """
+    try:
+        with open(path) as f: raw = json.load(f)
+        if not isinstance(raw, dict):
+            raise ValueError(f"{path}: expected an object with \"mappings\"")
+    except (OSError, ValueError):
+        if strict:
+            raise
+        raw = {'mappings': []}
+    return [normalize_command(m) for m in raw.get('mappings', [])]
+
+
+def save_commands(commands, path=COMMANDS_FILE):
+    data = {'mappings': [normalize_command(cmd) for cmd in commands]}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def match_execution_criteria(phrase_F, cmd_phrase, in_sentence):
+    """
+    Uncompiled reference matcher.
+    Whole phrase: the phrase equals the command, or one of its "/" alternatives.
+    In sentence: every command word (each may be "a/b" alternatives) appears in the phrase, in any order.
+    """
+    return _compile(cmd_phrase, in_sentence)(phrase_F.split(" "), phrase_F)
+
+
+def _compile(cmd_phrase, in_sentence):
+    if not in_sentence:
+        alternatives = frozenset(cmd_phrase.split("/"))
+        return lambda words, phrase: phrase in alternatives
+    cmd_words = [frozenset(w.split("/")) for w in cmd_phrase.split(" ")]
+    needed = len(cmd_words)
+
+    def match(words, phrase):
+        remaining = list(cmd_words)
+        matched = 0
+        for word in words:
+            for i, alts in enumerate(remaining):
+                if word in alts:
+                    del remaining[i]
+                    matched += 1
+                    break
+            if matched >= needed:
+                return True
+        return matched >= needed
+    return match
+
+
+# One published state of a CommandSet, replaced with a single attribute store so
+# matches() on the voice thread sees either the old or the new set, never a mix.
+# exact: phrase alternative -> [command index]; in_sentence: (command index, matcher);
+# patterns: PatternAutomaton for slot patterns like "set hue to {number}", or None
+_Compiled = namedtuple('_Compiled', 'commands exact in_sentence patterns pattern_keys cache')
+
+
+class CommandSet:
+    """
+    Commands compiled for matching.
+
+    Whole-phrase commands are looked up in a dict keyed by every "/" alternative,
+    in-sentence commands keep a compiled matcher each. Compiled matchers are cached
+    by (phrase, in_sentence), so update() after a reload only compiles what changed.
+    """
+
+    def __init__(self, commands=()):
+        self._compiled = _Compiled((), {}, (), None, (), {})
+        self.update(commands)
+
+    @property
+    def commands(self):
+        return self._compiled.commands
+
+    def update(self, commands):
+        """Swap in a new command list. Returns (compiled, reused) matcher counts."""
+        old = self._compiled
+        cache = {}
+        exact = {}
+        in_sentence = []
+        pattern_keys = []
+        compiled = reused = 0
+        for i, cmd in enumerate(commands):
+            key = (cmd['phrase'], bool(cmd['in_sentence']))
+            if is_pattern(key[0]):
+                pattern_keys.append((i,) + key)
+                continue
+            matcher = cache.get(key)
+            if matcher is None:
+                matcher = old.cache.get(key)
+                if matcher is None:
+                    matcher = _compile(*key)
+                    compiled += 1
+                else:
+                    reused += 1
+                cache[key] = matcher
+            if key[1]:
+                in_sentence.append((i, matcher))
+            else:
+                for alt in key[0].split("/"):
+                    exact.setdefault(alt, []).append(i)
+        pattern_keys = tuple(pattern_keys)
+        patterns = old.patterns
+        if pattern_keys != old.pattern_keys:
+            # the automaton is shared by all patterns, rebuild it only when one changed
+            patterns = PatternAutomaton() if pattern_keys else None
+            for i, phrase, ins in pattern_keys:
+                patterns.add(phrase, i, ins)
+            compiled += len(pattern_keys)
+        else:
+            reused += len(pattern_keys)
+        self._compiled = _Compiled(tuple(commands), exact, tuple(in_sentence), patterns, pattern_keys, cache)
+        return compiled, reused
+
+    def matches(self, phrase, avatar_id=None):
+        """(command, slots) for enabled commands in scope that match phrase, in command list order."""
+        c = self._compiled  # read once, a concurrent update() publishes a new snapshot
+        hits = dict.fromkeys(c.exact.get(phrase, ()), NO_SLOTS)
+        words = phrase.split(" ")
+        if c.in_sentence:
+            for i, matcher in c.in_sentence:
+                if matcher(words, phrase):
+                    hits[i] = NO_SLOTS
+        if c.patterns is not None:
+            hits.update(c.patterns.match(words))
+        for i in sorted(hits):
+            cmd = c.commands[i]
+            if cmd['enabled'] and (cmd['scope'] == 'global' or cmd['scope'] == avatar_id):
+                yield cmd, hits[i]
+
+    def dispatch(self, phrase, avatar_id, param_values, param_types=None):
+        """Everything a recognized phrase should trigger: [(command, slots, [action, ...])]."""
+        return [
+            (cmd, slots, list(resolve_actions(cmd, slots, param_values, param_types)))
+            for cmd, slots in self.matches(phrase, avatar_id)
+        ]
+
+
+NO_SLOTS = {}
+
+
+def parse_value(vs):
+    """Value typed into the command editor: bool, int, float or a slot reference like "{number}"."""
+    vs = vs.strip().lower()
+    if vs in ("true","false"):
+        return (vs=="true")
+    if vs.startswith("{") and vs.endswith("}"):
+        return vs
+    try:    return int(vs)
+    except:
+        try: return float(vs)
+        except: return 0
+
+
+def resolve_actions(cmd, slots, param_values, param_types=None):
+    """
+    Turn a matched command into what to send, in order:
+      ('osc', path, value, delay), ('chatbox', text, delay), ('replay', name, speed, filter, delay),
+      ('preset', name, delay)
+    """
+    param_types = param_types or {}
+    for act in cmd['actions']:
+        delay_s = act.get('delay', 0) or 0
+        if act['action_type'] == "Replay":
+            yield ('replay', act['path'], float(act.get('value', 1.0) or 1.0), act.get('filter', ''), delay_s)
+        elif act['action_type'] == "Preset":
+            yield ('preset', act['path'], delay_s)
+        elif act['action_type'] != "Chatbox":
+            if (act['path'] == ""): continue
+            path = act['path']
+            if act.get('toggle'):
+                # invert last‑known bool (default False)
+                cur   = bool(param_values.get(path, False))
+                new_v = not cur
+            else:
+                if (act['value'] == ""): continue
+                new_v = act['value']
+                if isinstance(new_v, str) and new_v.startswith("{"):
+                    new_v = resolve_slot_value(new_v, slots, param_types.get(path))
+                    if new_v is None: continue
+            yield ('osc', path, new_v, delay_s)
+        else:
+            text = act['path']
+            if slots:
+                text = SLOT_IN_TEXT.sub(lambda m: str(slots.get(m.group(1), m.group(0))), text)
+            yield ('chatbox', text, delay_s)
+
+
+# -- slot patterns ---------------------------------------------------------
+#
+# "set hue to {number}", "color {red|green|blue}" or with explicit slot names
+# "{hue:number}", "{c:red|green|blue}". Slot values are used in action values
+# as "{number}" or "{number:0..10}" (spoken range mapped onto the parameter).
+
+UNITS = {
+    'zero': 0, 'oh': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17,
+    'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+NEGATIVE = ('minus', 'negative')
+
+
+def _digits(word):
+    try:
+        return float(word) if '.' in word else int(word)
+    except ValueError:
+        return None
+
+
+def parse_number(words, i=0):
+    """
+    Parse spoken number words starting at words[i].
+    Returns (value, next_index), value is None when words[i] doesn't start a number.
+    Handles "twenty five", "one hundred and five", "two thousand", "zero point seven five",
+    "minus three" and plain digits.
+    """
+    n = len(words)
+    j = i
+    neg = False
+    if j < n and words[j] in NEGATIVE:
+        neg = True
+        j += 1
+    total = current = 0
+    last = None  # kind of the previous word, stops "five five" from becoming ten
+    start = j
+    while j < n:
+        w = words[j]
+        if w in UNITS and last not in ('unit', 'digits') and not (last == 'tens' and UNITS[w] >= 10):
+            current += UNITS[w]; last = 'unit'
+        elif w in TENS and last in (None, 'hundred', 'thousand'):
+            current += TENS[w]; last = 'tens'
+        elif w == 'hundred' and last in ('unit', 'tens', 'digits', None):
+            current = (current or 1) * 100; last = 'hundred'
+        elif w == 'thousand' and last is not None and last != 'thousand':
+            total += (current or 1) * 1000; current = 0; last = 'thousand'
+        elif w == 'and' and last in ('hundred', 'thousand') and j + 1 < n and (words[j + 1] in UNITS or words[j + 1] in TENS):
+            pass
+        elif last is None and _digits(w) is not None:
+            current = _digits(w); last = 'digits'
+        else:
+            break
+        j += 1
+    if j == start:
+        return None, i
+    value = total + current
+    # decimals are read digit by digit: "point seven five"
+    if j + 1 < n and words[j] == 'point' and words[j + 1] in UNITS and UNITS[words[j + 1]] < 10:
+        j += 1
+        frac = ''
+        while j < n and words[j] in UNITS and UNITS[words[j]] < 10:
+            frac += str(UNITS[words[j]]); j += 1
+        value = float(f"{int(value)}.{frac}")
+    return (-value if neg else value), j
+
+
+def _parse_pattern(cmd_phrase):
+    """Tokens of a pattern phrase: ('lit', frozenset) | ('num', name) | ('choice', name, choices)."""
+    tokens = []
+    numbers = 0
+    for word in cmd_phrase.split():
+        if word.startswith('{') and word.endswith('}'):
+            body = word[1:-1]
+            name, _, spec = body.rpartition(':')
+            if spec == 'number':
+                numbers += 1
+                tokens.append(('num', name or ('number' if numbers == 1 else f'number{numbers}')))
+            else:
+                choices = tuple(spec.split('|'))
+                tokens.append(('choice', name or 'choice', choices))
+        else:
+            tokens.append(('lit', frozenset(word.split('/'))))
+    return tokens
+
+
+class _Node:
+    __slots__ = ('words', 'nums', 'groups', 'ends')
+
+    def __init__(self):
+        self.words = {}   # word -> [(child, capture or None)]
+        self.nums = {}    # slot name -> child
+        self.groups = {}  # (slot name, choices) or (None, literal alternatives) -> child, so equal tokens share a node
+        self.ends = []    # command indices whose pattern ends here
+
+
+class PatternAutomaton:
+    """
+    All slot patterns merged into one token trie with shared prefixes. Matching walks
+    the utterance keeping only the trie states reachable so far, so the cost grows with
+    the utterance length (times the longest pattern for in-sentence patterns, which may
+    start at any word), not with the number of patterns loaded.
+    """
+
+    def __init__(self):
+        self.root = _Node()      # patterns that must cover the whole utterance
+        self.anywhere = _Node()  # in-sentence patterns
+
+    def add(self, cmd_phrase, index, in_sentence):
+        node = self.anywhere if in_sentence else self.root
+        for tok in _parse_pattern(cmd_phrase):
+            if tok[0] == 'num':
+                node = node.nums.setdefault(tok[1], _Node())
+                continue
+            # every "a/b" alternative leads to the same child, so a pattern adds
+            # one node per token however many alternatives it has
+            key = (None, tok[1]) if tok[0] == 'lit' else tok[1:]
+            child = node.groups.get(key)
+            if child is None:
+                child = node.groups[key] = _Node()
+                if tok[0] == 'lit':
+                    for w in tok[1]:
+                        node.words.setdefault(w, []).append((child, None))
+                else:
+                    _, name, choices = tok
+                    for k, w in enumerate(choices):
+                        node.words.setdefault(w, []).append((child, (name, w, k, len(choices))))
+            node = child
+        node.ends.append(index)
+
+    def match(self, words):
+        """Return {command index: slots} for every pattern matching the word list."""
+        found = {}
+        n = len(words)
+        # states: (node, position, slots, anchored); positions only move forward
+        states = [(self.root, 0, {}, True)]
+        if self.anywhere.words or self.anywhere.nums:
+            states += [(self.anywhere, i, {}, False) for i in range(n)]
+        while states:
+            node, i, slots, anchored = states.pop()
+            if node.ends and (i == n or not anchored):
+                for idx in node.ends:
+                    found.setdefault(idx, slots)
+            if i >= n:
+                continue
+            for child, capture in node.words.get(words[i], ()):
+                if capture is not None:
+                    name, word, k, size = capture
+                    child_slots = dict(slots); child_slots[name] = Choice(word, k, size)
+                else:
+                    child_slots = slots
+                states.append((child, i + 1, child_slots, anchored))
+            if node.nums:
+                value, j = parse_number(words, i)
+                if value is not None:
+                    for name, child in node.nums.items():
+                        child_slots = dict(slots); child_slots[name] = value
+                        states.append((child, j, child_slots, anchored))
+        return found
+
+
+class Choice(str):
+    """A captured choice word that also remembers its position in the choice list."""
+
+    def __new__(cls, word, index, size):
+        obj = super().__new__(cls, word)
+        obj.index = index
+        obj.size = size
+        return obj
+
+
+def is_pattern(cmd_phrase):
+    return '{' in cmd_phrase
+
+
+SLOT_REF = re.compile(r'^\{(\w+)(?::(-?[\d.]+)\.\.(-?[\d.]+))?\}$')
+SLOT_IN_TEXT = re.compile(r'\{(\w+)\}')
+
+
+def _clamp(v, lo, hi):
+    return lo if v < lo else hi if v > hi else v
+
+
+def resolve_slot_value(template, slots, param_type=None):
+    """
+    Value for a slot reference such as "{number}" or "{number:0..10}".
+
+    Numbers: an explicit spoken range is mapped onto the whole parameter range
+    (Float 0..1, Int 0..255), so percent is "{number:0..100}". Without one, Float
+    takes the number as spoken ("zero point five" is 0.5), clamped to -1..1,
+    Int is rounded and clamped, Bool is "not zero".
+    Choices: Int gets the index, Float the index spread over 0..1, Bool "not the first".
+    Returns None when the slot wasn't captured.
+    """
+    m = SLOT_REF.match(template)
+    if not m or m.group(1) not in slots:
+        return None
+    v = slots[m.group(1)]
+    if isinstance(v, Choice):
+        if param_type == 'Bool':
+            return v.index != 0
+        if param_type == 'Float':
+            return v.index / (v.size - 1) if v.size > 1 else 0.0
+        return v.index
+    if param_type == 'Bool':
+        return v != 0
+    if m.group(2) is not None:
+        lo, hi = float(m.group(2)), float(m.group(3))
+        frac = _clamp((v - lo) / (hi - lo), 0.0, 1.0) if hi != lo else 0.0
+        return round(frac * 255) if param_type == 'Int' else frac
+    if param_type == 'Float':
+        return float(_clamp(v, -1.0, 1.0))
+    if param_type == 'Int':
+        return int(_clamp(round(v), 0, 255))
+    return v
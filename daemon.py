@@ -0,0 +1,429 @@
+# daemon.py
+"""
+Headless multi-profile runner: one voice pipeline per VRChat client, no Qt.
+
+    python daemon.py [profiles.json] [--status-interval 10] [--status-file daemon_status.json]
+                     [--metrics-port 9110]
+
+profiles.json:
+    {
+      "model_path": "models/vosk-model-small-en-us-0.15",
+      "profiles": [
+        {"name": "main", "device": 1, "host": "127.0.0.1", "out_port": 9000, "in_port": 9001,
+         "commands_file": "commands.json", "module_settings_file": "module_settings.json"},
+        {"name": "alt", "device": 3, "out_port": 9010, "in_port": 9011,
+         "commands_file": "commands_alt.json", "module_settings_file": "module_settings_alt.json"}
+      ]
+    }
+
+Every profile decodes in its own worker process. Where processes are forked
+(Linux, macOS with the fork start method) the daemon loads each distinct model
+once before starting the workers, so they share its pages copy-on-write instead
+of holding a copy each. A worker restarted after a crash is forked from the
+daemon as it is at that moment: the models are still loaded there, so it
+shares them as well, but it also gets a copy of everything else the daemon
+holds by then (status buffers, the metrics server socket), which it leaves
+alone. With spawn (Windows) every worker loads its own.
+
+Workers report CPU time, memory and stage latencies; the daemon prints a table
+per profile every --status-interval seconds and keeps the same numbers as
+labelled gauges for --metrics-port.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+
+import metrics
+from metrics import now
+from commands import CommandSet, load_commands, COMMANDS_FILE
+from presets import load_presets, PRESETS_FILE
+from actions import ActionRunner
+from avatar_params import AvatarParamResolver, OSCQueryClient
+from modules.chatbox import ChatboxRelay, read_module_settings
+from modules.pipeline import ModulePipeline
+
+PROFILES_FILE = 'profiles.json'
+DEFAULT_MODEL = "models/vosk-model-small-en-us-0.15"
+RESTART_BACKOFF_S = 5
+
+# model_path -> vosk.Model, filled in the parent before forking
+_shared_models = {}
+
+
+def read_profiles(path=PROFILES_FILE):
+    with open(path) as f: data = json.load(f)
+    profiles = []
+    for i, p in enumerate(data.get('profiles', [])):
+        p.setdefault('name', f'profile{i + 1}')
+        p.setdefault('device', None)
+        p.setdefault('host', '127.0.0.1')
+        p.setdefault('out_port', 9000 + 10 * i)
+        p.setdefault('in_port', p['out_port'] + 1)
+        p.setdefault('commands_file', COMMANDS_FILE)
+        p.setdefault('module_settings_file', 'module_settings.json')
+        p.setdefault('presets_file', PRESETS_FILE)
+        p.setdefault('model_path', data.get('model_path', DEFAULT_MODEL))
+        p.setdefault('idle_unload_minutes', data.get('idle_unload_minutes', 0)) # 0 = keep the model loaded
+        p.setdefault('wake_level', data.get('wake_level', 1500))
+        p.setdefault('endpointing', data.get('endpointing', 'balanced')) # short, balanced, dictation or auto
+        p.setdefault('audio_source', 'local') # local, udp, tcp (see netaudio.py)
+        p.setdefault('audio_port', 9100 + i)
+        p.setdefault('audio_jitter_ms', 80)
+        p.setdefault('oscquery', data.get('oscquery', True)) # parameter types for slot values, see avatar_params.py
+        p.setdefault('oscquery_port', 0)                      # 0 discovers it via mDNS
+        profiles.append(p)
+    names = [p['name'] for p in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"profile names must be unique: {names}")
+    return profiles
+
+
+def forking():
+    return mp.get_start_method() == 'fork'
+
+
+def preload_models(profiles):
+    """Load each distinct model once so forked workers share it."""
+    if not forking():
+        return
+    from vosk import Model
+    for path in sorted({p['model_path'] for p in profiles}):
+        if path not in _shared_models and os.path.isdir(path):
+            t0 = now()
+            _shared_models[path] = Model(path)
+            print(f"Loaded shared model {path} in {now() - t0:.2f}s")
+
+
+def memory_usage():
+    """(rss, unique) bytes of this process. unique leaves out pages shared with other
+    processes, such as a model inherited from the daemon; None where it can't be told."""
+    try:
+        import psutil
+        info = psutil.Process().memory_full_info()
+        return info.rss, info.uss
+    except ImportError:
+        pass
+    try:
+        # Linux without psutil: proportional set size is close enough to unique
+        values = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    values[key] = int(rest.split()[0]) * 1024
+        return values['Rss'], values.get('Pss')
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, None  # peak, in KiB on Linux
+    except ImportError:
+        return None, None
+
+
+class ProfileWorker:
+    """One profile's pipeline inside a worker process: mic, decoder, commands, chatbox."""
+
+    def __init__(self, profile, stats, stop, interval):
+        self.profile = profile
+        self.stats = stats
+        self.stop = stop
+        self.interval = interval
+        self.name = profile['name']
+        self.param_values = {}
+        self.param_types = {}
+        self.current_avatar_id = None
+        self.replays = {}
+        self._commands_stamp = None
+
+    def log(self, msg):
+        print(f"[{self.name}] {msg}")
+
+    def run(self):
+        from pythonosc import osc_server
+        from pythonosc.dispatcher import Dispatcher
+        from osc_sender import OSCSender, PacedSender
+        from voice import VoiceRecognizer, pick_endpointing
+
+        p = self.profile
+        self.osc = OSCSender(p['host'], p['out_port'])
+        self.paced = PacedSender(self.osc)
+        self.presets = load_presets(p['presets_file'])
+        self.actions = ActionRunner(self, lambda path, v, delay_s: self._later(delay_s, self.osc.send, path, v), self._later)
+        self.param_resolver = AvatarParamResolver(
+            OSCQueryClient(port=p['oscquery_port'] or None) if p['oscquery'] else None)
+        self.chatbox = ChatboxRelay(read_module_settings(p['module_settings_file']), self.osc.send)
+        self.modules = ModulePipeline([self.chatbox])
+        self._load_commands()
+
+        disp = Dispatcher()
+        disp.map('/avatar/change', self._on_avatar_change)
+        disp.map('/avatar/parameters/*', self._on_param_changed)
+        server = osc_server.ThreadingOSCUDPServer(('0.0.0.0', p['in_port']), disp)
+        threading.Thread(target=server.serve_forever, daemon=True, name="osc").start()
+
+        source = None
+        if p['audio_source'] in ('udp', 'tcp'):
+            from netaudio import NetworkAudioSource
+            source = NetworkAudioSource(p['audio_port'], transport=p['audio_source'], max_wait_ms=p['audio_jitter_ms'])
+        shared = _shared_models.get(p['model_path'])
+        self.voice = VoiceRecognizer(
+            self.on_phrase_detected, self.modules.partial, p['model_path'], p['device'],
+            idle_unload_s=p['idle_unload_minutes'] * 60, wake_level=p['wake_level'], model=shared, source=source)
+        self.voice.set_endpointing(pick_endpointing(p['endpointing'], self.chatbox.settings['stt_mode'], self.log))
+        self.voice.start()
+        self.log(f"listening on device {p['device']}, OSC out {p['host']}:{p['out_port']}, in {p['in_port']}"
+                 + (" (shared model)" if shared is not None else ""))
+        try:
+            while not self.stop.wait(self.interval):
+                self._reload_commands_if_changed()
+                self.report()
+        finally:
+            server.shutdown(); server.server_close()
+            self.report()
+            self.voice.stop()
+            self.modules.stop()
+
+    def _load_commands(self):
+        path = self.profile['commands_file']
+        try:
+            self._commands_stamp = os.stat(path).st_mtime_ns
+        except OSError:
+            self._commands_stamp = None
+        self.commands = CommandSet(load_commands(path))
+
+    def _reload_commands_if_changed(self):
+        try:
+            stamp = os.stat(self.profile['commands_file']).st_mtime_ns
+        except OSError:
+            return
+        if stamp != self._commands_stamp:
+            self._commands_stamp = stamp
+            try:
+                commands = load_commands(self.profile['commands_file'], strict=True)
+            except (OSError, ValueError) as e:
+                self.log(f"Keeping the current commands, reload failed: {e}")
+                return
+            compiled, reused = self.commands.update(commands)
+            self.log(f"Reloaded commands: {compiled} compiled, {reused} reused")
+
+    def _on_avatar_change(self, unused_addr, avatar_id):
+        self.current_avatar_id = avatar_id
+        self.param_types = {}
+        self.log(f"Avatar change detected: {avatar_id}")
+        self.param_resolver.resolve(avatar_id, self._on_params_resolved)
+
+    def _on_params_resolved(self, avatar_id, params, source):
+        if avatar_id != self.current_avatar_id:
+            return
+        if params is None:
+            self.log(f"Avatar parameters unknown, slot values are sent untyped: {source}")
+            return
+        self.param_types = {p['address']: p['type'] for p in params}
+        self.log(f"Loaded {len(params)} avatar parameters from {source}")
+
+    def _on_param_changed(self, address, value):
+        metrics.osc_received.inc()
+        self.param_values[address] = value
+
+    def _later(self, delay_s, fn, *args):
+        if delay_s > 0:
+            t = threading.Timer(delay_s, fn, args)
+            t.daemon = True
+            t.start()
+        else:
+            fn(*args)
+
+    def on_phrase_detected(self, phrase):
+        self.actions.on_phrase(phrase, self.param_types)
+        self.modules.final(phrase)
+
+    def report(self):
+        rss, unique = memory_usage()
+        self.stats.put({
+            'name': self.name,
+            'pid': os.getpid(),
+            'time': time.monotonic(),
+            'cpu_s': time.process_time(),
+            'rss': rss,
+            'unique': unique,
+            'model_loaded': self.voice.loaded,
+            'shared_model': self.voice.shared_model is not None,
+            'utterances': metrics.utterances.value,
+            'osc_sent': metrics.osc_sent.value,
+            'dropped': metrics.audio_dropped.value,
+            'endpointing': self.voice.endpointing,
+            'modules': self.modules.stats(),
+            'endpoint_ms': {name: h.mean() * 1000 for name, h in metrics.endpoint.items() if h.count},
+            'latency': {s: {'p50': metrics.stage[s].quantile(0.5), 'p95': metrics.stage[s].quantile(0.95),
+                            'n': metrics.stage[s].count} for s in metrics.STAGES},
+        })
+
+
+def run_profile(profile, stats, stop, interval):
+    """Worker process entry point."""
+    try:
+        ProfileWorker(profile, stats, stop, interval).run()
+    except KeyboardInterrupt:
+        pass  # the daemon got Ctrl+C as well and stops us through the event
+
+
+class Daemon:
+    def __init__(self, profiles, interval=10, status_file=None, metrics_port=0):
+        self.profiles = {p['name']: p for p in profiles}
+        self.interval = interval
+        self.status_file = status_file
+        self.metrics_port = metrics_port
+        self.stats = mp.Queue()
+        self.stop = mp.Event()
+        self.procs = {}
+        self.started = {}
+        self.latest = {}
+        self.previous = {}
+
+    def start_worker(self, name):
+        proc = mp.Process(target=run_profile, args=(self.profiles[name], self.stats, self.stop, self.interval),
+                          name=f"profile-{name}", daemon=True)
+        proc.start()
+        self.procs[name] = proc
+        self.started[name] = time.monotonic()
+
+    def run(self):
+        preload_models(self.profiles.values())
+        for name in self.profiles:
+            self.start_worker(name)
+        if self.metrics_port:
+            # after the first fork so those workers don't hold its socket; restarted ones do, unused
+            metrics.MetricsServer(self.metrics_port).start()
+            print(f"Metrics on http://127.0.0.1:{self.metrics_port}/metrics")
+        next_status = time.monotonic() + self.interval
+        try:
+            while True:
+                try:
+                    s = self.stats.get(timeout=max(0.1, next_status - time.monotonic()))
+                    if s['name'] in self.latest:
+                        self.previous[s['name']] = self.latest[s['name']]
+                    self.latest[s['name']] = s
+                except queue.Empty:
+                    pass
+                if time.monotonic() >= next_status:
+                    self.check_workers()
+                    self.print_status()
+                    next_status += self.interval
+        except KeyboardInterrupt:
+            print("Stopping profiles")
+        finally:
+            self.shutdown()
+
+    def check_workers(self):
+        for name, proc in self.procs.items():
+            if proc.is_alive():
+                continue
+            if time.monotonic() - self.started[name] < RESTART_BACKOFF_S:
+                continue
+            print(f"[{name}] worker exited with code {proc.exitcode}, restarting")
+            self.previous.pop(name, None); self.latest.pop(name, None)
+            self.start_worker(name)
+
+    def rows(self):
+        """Per-profile numbers for the table, the status file and the gauges."""
+        rows = []
+        for name, proc in self.procs.items():
+            s = self.latest.get(name)
+            row = {'name': name, 'pid': proc.pid, 'alive': proc.is_alive()}
+            if s is not None:
+                prev = self.previous.get(name)
+                cpu = None
+                if prev is not None and s['time'] > prev['time']:
+                    cpu = 100 * (s['cpu_s'] - prev['cpu_s']) / (s['time'] - prev['time'])
+                row.update({k: s[k] for k in ('rss', 'unique', 'model_loaded', 'shared_model', 'utterances',
+                                              'osc_sent', 'dropped', 'endpointing', 'endpoint_ms', 'latency')})
+                row['cpu_percent'] = cpu
+            rows.append(row)
+        return rows
+
+    def print_status(self):
+        rows = self.rows()
+        mb = lambda b: f"{b / 2**20:8.1f}" if b is not None else "       -"
+        # average speech end to final result under the profile in use
+        ep = lambda r: f"{r['endpoint_ms'][r['endpointing']]:9.0f}" if r.get('endpointing') in r.get('endpoint_ms', {}) else "        -"
+        ms = lambda r, st: f"{r['latency'][st]['p95'] * 1000:9.1f}" if 'latency' in r else "        -"
+        print(f"{'profile':<14}{'pid':>7}{'cpu %':>7}{'rss MB':>9}{'own MB':>9}{'utt':>6}"
+              f"{'decode p95':>11}{'match p95':>10}{'send p95':>10}{'endpoint':>10}  model")
+        total_cpu = 0.0
+        total_own = 0
+        for r in rows:
+            cpu = r.get('cpu_percent')
+            total_cpu += cpu or 0
+            total_own += r.get('unique') or r.get('rss') or 0
+            if not r['alive']:
+                model = 'down'
+            elif not r.get('model_loaded', True):
+                model = 'unloaded'
+            else:
+                model = 'shared' if r.get('shared_model') else 'own'
+            print(f"{r['name']:<14}{r['pid'] or 0:>7}{cpu if cpu is not None else 0:7.1f}{mb(r.get('rss'))}"
+                  f"{mb(r.get('unique'))}{r.get('utterances', 0):>6}"
+                  f"{ms(r, 'decode'):>11}{ms(r, 'match'):>10}{ms(r, 'send'):>10}{ep(r):>10}  {model}")
+            for name, m in r.get('modules', {}).items():
+                if m['dropped'] or m['over_budget']:
+                    print(f"{'':<14}module {name}: {m['over_budget']} over budget, {m['dropped']} dropped, "
+                          f"final avg {m['final_ms']:.1f} ms")
+        own_rss, _ = memory_usage()
+        print(f"{'total':<14}{'':>7}{total_cpu:7.1f}{'':>9}{mb(total_own)}  (+{mb(own_rss).strip()} MB daemon incl. shared models)")
+        self.export(rows)
+
+    def export(self, rows):
+        for r in rows:
+            metrics.metrics.gauge("profile_up", "1 while the profile's worker runs", profile=r['name']).set(int(r['alive']))
+            if r.get('cpu_percent') is not None:
+                metrics.metrics.gauge("profile_cpu_percent", "Worker CPU use over the last interval",
+                                      profile=r['name']).set(round(r['cpu_percent'], 2))
+            for key in ('rss', 'unique'):
+                if r.get(key) is not None:
+                    metrics.metrics.gauge(f"profile_memory_{key}_bytes", "Worker memory", profile=r['name']).set(r[key])
+            for st, q in r.get('latency', {}).items():
+                metrics.metrics.gauge("profile_stage_p95_seconds", "95th percentile stage latency",
+                                      profile=r['name'], stage=st).set(q['p95'])
+            for name, m in r.get('modules', {}).items():
+                metrics.metrics.gauge("profile_module_over_budget", "Module events that took longer than the module's budget",
+                                      profile=r['name'], module=name).set(m['over_budget'])
+                metrics.metrics.gauge("profile_module_dropped", "Final results a full module queue discarded",
+                                      profile=r['name'], module=name).set(m['dropped'])
+        if self.status_file:
+            try:
+                with open(self.status_file, 'w') as f: json.dump({'time': time.time(), 'profiles': rows}, f, indent=2)
+            except OSError as e:
+                print(f"Could not write {self.status_file}: {e}")
+
+    def shutdown(self):
+        self.stop.set()
+        for proc in self.procs.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run several voice profiles headless, one worker process each.")
+    ap.add_argument('profiles', nargs='?', default=PROFILES_FILE)
+    ap.add_argument('--status-interval', type=float, default=10, help="seconds between status tables")
+    ap.add_argument('--status-file', help="also write the status as JSON here")
+    ap.add_argument('--metrics-port', type=int, default=0, help="serve per-profile gauges on /metrics")
+    args = ap.parse_args()
+
+    profiles = read_profiles(args.profiles)
+    if not profiles:
+        sys.exit(f"No profiles in {args.profiles}")
+    if sys.platform.startswith('linux'):
+        mp.set_start_method('fork')  # 3.14 defaults to forkserver, which can't inherit the shared models
+    Daemon(profiles, args.status_interval, args.status_file, args.metrics_port).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,19 +9,31 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
     QLabel, QLineEdit, QSpinBox, QPushButton, QListWidget, QTextEdit,
     QTableWidget, QTableWidgetItem, QComboBox, QHeaderView, QRadioButton,
-    QDialog, QDialogButtonBox, QCompleter, QCheckBox, QListWidgetItem, QMessageBox
+    QDialog, QDialogButtonBox, QCompleter, QCheckBox, QListWidgetItem, QMessageBox, QInputDialog
 )
 from PyQt5.QtGui import QFont, QDoubleValidator, QDesktopServices
 from pythonosc.dispatcher import Dispatcher
 from pythonosc import osc_server
-from osc_sender import OSCSender
-from voice import VoiceRecognizer
+from osc_sender import OSCSender, PacedSender
+from voice import VoiceRecognizer, pick_endpointing
+from blackbox import BlackBox
+import metrics
+from metrics import now, MetricsServer
+from profiler import profiler
+from recorder import ParamRecorder, recording_path, list_recordings
+from avatar_params import AvatarParamResolver, OSCQueryClient
+from presets import load_presets, save_presets, snapshot, PRESETS_FILE
+from commands import CommandSet, load_commands, save_commands, match_execution_criteria, parse_value
 import sounddevice as sd
 import urllib.request
 
 GITHUB_API_LATEST = "https://api.github.com/repos/DeMuenu/VoiceToOSC/releases/latest"
 CURRENT_VERSION = "0.0.3"
 CHECK_DELAY_MS   = 1000
+CONFIG_POLL_MS   = 1000
+SETTINGS_FILE = 'settings.json'
+COMMANDS_FILE = 'commands.json'
+MODULE_SETTINGS_FILE = 'module_settings.json'
 
 
 
@@ -50,6 +62,9 @@ def is_newer(latest, current):
     return a > b  # lexicographic comparison
 
 from modules.speechtotext import STT
+from modules.chatbox import ChatboxRelay, read_module_settings
+from modules.pipeline import ModulePipeline
+from actions import ActionRunner
 
 class CommandItem(QtWidgets.QListWidgetItem):
     def __init__(self, phrase, actions, enabled=True, scope='global'):
@@ -64,7 +79,9 @@ class MainWindow(QMainWindow):
     avatarChanged = pyqtSignal(str)
     avatarLoaded  = pyqtSignal(str)
     logSignal = pyqtSignal(str)
-    scheduleOSC = pyqtSignal(str, object, float)
+    scheduleOSC = pyqtSignal(str, object, float, float)
+    scheduleCall = pyqtSignal(float, object)
+    paramsResolved = pyqtSignal(str, object, str)
 
     def __init__(self):
         super().__init__()
@@ -72,6 +89,8 @@ class MainWindow(QMainWindow):
         self.avatarLoaded .connect(self._on_avatar_loaded_main)
         self.logSignal.connect(self._append_log)
         self.scheduleOSC.connect(self._on_schedule_osc)
+        self.scheduleCall.connect(self._on_schedule_call)
+        self.paramsResolved.connect(self._on_params_resolved)
         self.setWindowTitle("VRChat VoiceToOSC")
         self.resize(1000, 700)
         self.setStyleSheet("""
@@ -87,13 +106,22 @@ class MainWindow(QMainWindow):
         self.current_avatar_id = None
         self.listening = False
         self.param_values = {}
-        self.lastChatboxmessage = ''
+        self.chatbox = ChatboxRelay({}, lambda path, v: self.scheduleOSC.emit(path, v, 0, now()))
+        self.modules = ModulePipeline([self.chatbox])  # each module on its own worker, off the voice thread
+        self.actions = ActionRunner(self, lambda path, v, delay_s: self.scheduleOSC.emit(path, v, delay_s, now()), self._later)
+        self.recorder = None
+        self.replays = {}
+        self.osc_server = None
+        self.metrics_server = None
+        self._config_stamps = {}
 
 
         # Load settings & commands
         self._load_settings()
         self._load_commands()
         self._load_module_settings()
+        self.presets = load_presets(PRESETS_FILE)
+        self.param_resolver = self._create_param_resolver()
 
         # Build UI
 
@@ -105,12 +133,22 @@ class MainWindow(QMainWindow):
 
         # OSC sender & voice
         self.osc = OSCSender(self.settings['host'], self.settings['out_port'])
-        self.voice = VoiceRecognizer(self.on_phrase_detected, self.on_partial_phrase_dedected, model_path=self.settings['model_path'], device=self.settings.get('device'))
+        self.paced = PacedSender(self.osc, rate=self.settings['preset_rate'], batch=self.settings['preset_batch'])
+        self.blackbox = self._create_blackbox()
+        self.voice = self._create_voice()
 
         # Start OSC listener
         self._start_osc_listener()
+        self._start_metrics_server()
         self.toggle_listening()
 
+        # hot reload of hand edited config files
+        for path in (SETTINGS_FILE, COMMANDS_FILE, MODULE_SETTINGS_FILE):
+            self._config_stamps[path] = self._file_stamp(path)
+        self.config_timer = QTimer(self)
+        self.config_timer.timeout.connect(self._check_config_files)
+        self.config_timer.start(CONFIG_POLL_MS)
+
     def check_for_updates(self):
         req = urllib.request.Request(
         GITHUB_API_LATEST,
@@ -230,8 +268,27 @@ class MainWindow(QMainWindow):
         modules = QHBoxLayout()
         stt_btn = QPushButton("Speech to Chatbox"); stt_btn.clicked.connect(self.edit_stt)
         modules.addWidget(stt_btn)
+        self.rec_btn = QPushButton("Start Recording"); self.rec_btn.clicked.connect(self.toggle_recording)
+        modules.addWidget(self.rec_btn)
+        bb_btn = QPushButton("Save last utterance"); bb_btn.clicked.connect(self.save_last_utterance)
+        modules.addWidget(bb_btn)
+        preset_btn = QPushButton("Save Avatar Preset"); preset_btn.clicked.connect(self.save_preset)
+        modules.addWidget(preset_btn)
         layout.addLayout(modules)
 
+        # Recognition gate state
+        self.gate_label = QLabel("Recognition active")
+        layout.addWidget(self.gate_label)
+
+        # Metrics
+        layout.addWidget(QLabel("Metrics:"))
+        self.metrics_label = QLabel(metrics.summary())
+        self.metrics_label.setFont(QFont("Consolas", 8))
+        layout.addWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self._update_status)
+        self.metrics_timer.start(1000)
+
         # Log
         layout.addWidget(QLabel("Log:"))
         self.log_widget = QTextEdit(); self.log_widget.setReadOnly(True); self.log_widget.setFixedHeight(160)
@@ -264,57 +321,235 @@ class MainWindow(QMainWindow):
                     self.device_box.setCurrentIndex(i)
                     break
 
+    def _create_voice(self):
+        voice = VoiceRecognizer(
+            self.on_phrase_detected, self.on_partial_phrase_dedected,
+            model_path=self.settings['model_path'], device=self.settings.get('device'),
+            idle_unload_s=self.settings['idle_unload_minutes'] * 60, wake_level=self.settings['wake_level'],
+            source=self._create_audio_source()
+        )
+        self._apply_gates(voice)
+        self._apply_endpointing(voice)
+        voice.blackbox = self.blackbox
+        return voice
+
+    def _apply_endpointing(self, voice=None):
+        voice = voice or self.voice
+        name = pick_endpointing(self.settings['endpointing'], self.module_settings['stt_mode'], self.log)
+        if name != voice.endpointing:
+            voice.set_endpointing(name)
+            self.log(f"Endpointing profile: {name}")
+
+    def _create_blackbox(self):
+        if not self.settings['blackbox_minutes']:
+            return None
+        try:
+            return BlackBox(self.settings['blackbox_file'], self.settings['blackbox_minutes'])
+        except (OSError, ValueError) as e:
+            self.log(f"Black box disabled: {e}")
+            return None
+
+    def save_last_utterance(self):
+        if self.blackbox is None:
+            self.log("The black box is off, set blackbox_minutes in settings.json")
+            return
+        path = self.blackbox.export_last()
+        if path is None:
+            self.log("Nothing recognized yet")
+        else:
+            self.log(f"Saved last utterance to {path} (replay: python blackbox.py replay {path})")
+
+    def _create_audio_source(self):
+        # None is the local microphone (settings['device'])
+        if self.settings['audio_source'] in ('udp', 'tcp'):
+            from netaudio import NetworkAudioSource  # builds the mu-law tables, only when remote audio is used
+            return NetworkAudioSource(self.settings['audio_port'], transport=self.settings['audio_source'],
+                                      max_wait_ms=self.settings['audio_jitter_ms'])
+        return None
+
+    def _apply_gates(self, voice):
+        # address -> (gate name, value that closes it)
+        self.gate_lookup = {
+            addr: (name, name != 'enable')
+            for name, addr in self.settings['gate_params'].items() if addr
+        }
+        for name in voice.closed_gates:
+            voice.set_gate(name, False)
+        for addr, (name, closing) in self.gate_lookup.items():
+            if addr in self.param_values:
+                voice.set_gate(name, bool(self.param_values[addr]) == closing)
+
+    def _update_status(self):
+        self.metrics_label.setText(metrics.summary())
+        gates = self.voice.closed_gates
+        state = f"Recognition paused by: {', '.join(gates)}" if gates else "Recognition active"
+        self.gate_label.setText(f"{state}  (CPU saved by gating: {self.voice.cpu_saved_s():.1f} s)")
+        self.gate_label.setStyleSheet("color: orange;" if gates else "color: lightgreen;")
+
     def toggle_listening(self):
         if self.listening:
             self.voice.stop(); self.listening=False; self.toggle_btn.setText("Start Listening"); self.log("Voice listening stopped")
         else:
             self.voice.start(); self.listening=True; self.toggle_btn.setText("Stop Listening"); self.log("Voice listening started")
 
-    def _load_module_settings(self):
-        try:
-            with open('module_settings.json') as f: self.module_settings=json.load(f)
-        except: self.module_settings={'stt_mode':'OFF','stt_activation__phrase':'status', 'send_confirm': 'NORMAL'}
-        self.module_settings.setdefault('stt_mode', 'OFF')
-        self.module_settings.setdefault('stt_activation__phrase','status')
-        self.module_settings.setdefault('send_confirm','NORMAL') #NORMAL, CONFIRM, LIVE
+    def _read_module_settings(self, strict=False):
+        return read_module_settings(MODULE_SETTINGS_FILE, strict)
+
+    def _load_module_settings(self, strict=False):
+        self.module_settings = self._read_module_settings(strict)
+        self.chatbox.settings = self.module_settings
 
     def _save_module_settings(self):
-        with open('module_settings.json','w') as f: json.dump(self.module_settings,f,indent=2)
+        with open(MODULE_SETTINGS_FILE,'w') as f: json.dump(self.module_settings,f,indent=2)
+        self._config_stamps[MODULE_SETTINGS_FILE] = self._file_stamp(MODULE_SETTINGS_FILE)
 
-    def _load_settings(self):
+    def _read_settings(self, strict=False):
+        # strict (hot reload) raises on a broken file so the running settings stay as they are
         try:
-            with open('settings.json') as f: self.settings=json.load(f)
-        except: self.settings={'host':'127.0.0.1','out_port':9000,'in_port':9001}
-        self.settings.setdefault('out_port',self.settings.get('port',9000))
-        self.settings.setdefault('in_port',9001)
-        self.settings.setdefault('model_path', 'models/vosk-model-small-en-us-0.15')
+            with open(SETTINGS_FILE) as f: settings=json.load(f)
+            if not isinstance(settings, dict):
+                raise ValueError(f"{SETTINGS_FILE}: expected an object")
+        except (OSError, ValueError):
+            if strict:
+                raise
+            settings={'host':'127.0.0.1','out_port':9000,'in_port':9001}
+        settings.setdefault('out_port',settings.get('port',9000))
+        settings.setdefault('in_port',9001)
+        settings.setdefault('model_path', 'models/vosk-model-small-en-us-0.15')
+        settings.setdefault('idle_unload_minutes', 0) # 0 keeps the model loaded
+        settings.setdefault('wake_level', 1500) # int16 peak that reloads an idle model
+        settings.setdefault('audio_source', 'local') # local, udp, tcp (remote capture with netaudio.py)
+        settings.setdefault('audio_port', 9100)      # port remote audio arrives on
+        settings.setdefault('audio_jitter_ms', 80)   # how long a gap in remote audio is waited for
+        settings.setdefault('endpointing', 'balanced') # short, balanced (Vosk's defaults), dictation; auto = short while the chatbox is OFF
+        settings.setdefault('blackbox_minutes', 0)   # rolling audio + results kept for bug reports, 0 disables
+        settings.setdefault('blackbox_file', 'blackbox.ring')
+        # OSC parameters that pause recognition, '' disables a gate
+        settings.setdefault('gate_params', {})
+        settings['gate_params'].setdefault('mute', '')                          # closed while truthy, e.g. /avatar/parameters/MuteSelf
+        settings['gate_params'].setdefault('afk', '')                           # closed while truthy, e.g. /avatar/parameters/AFK
+        settings['gate_params'].setdefault('enable', '/avatar/parameters/VoiceToOSC') # closed while falsy
+        settings.setdefault('preset_rate', 100) # packets per second when applying a preset, 0 = unpaced
+        settings.setdefault('preset_batch', 8)  # parameters per bundle
+        settings.setdefault('oscquery', True)   # ask VRChat for avatar parameters over OSCQuery
+        settings.setdefault('oscquery_port', 0) # 0 discovers it via mDNS (needs zeroconf)
+        settings.setdefault('metrics_port', 9120) # 0 disables the /metrics endpoint
+        settings.setdefault('profile_mode', 'OFF') # OFF, SAMPLE, CPROFILE
+        settings.setdefault('profile_dir', 'profiles')
+        settings.setdefault('profile_tracemalloc_interval', 60) # seconds, 0 disables
+        return settings
+
+    def _load_settings(self):
+        self.settings = self._read_settings()
+        if self.settings['profile_mode'] != 'OFF' and not profiler.enabled:
+            profiler.configure(self.settings['profile_mode'], out_dir=self.settings['profile_dir'],
+                               tracemalloc_interval=self.settings['profile_tracemalloc_interval']).start()
 
     def save_settings(self):
-        self.settings['host']=self.host_edit.text(); self.settings['out_port']=self.out_port_edit.value(); self.settings['in_port']=self.in_port_edit.value(); self.settings['device'] = self.device_box.currentData(); self.settings['model_path'] = self.model_box.currentData() 
-        with open('settings.json','w') as f: json.dump(self.settings,f,indent=2)
-        self.osc=OSCSender(self.settings['host'],self.settings['out_port'])
+        new = dict(self.settings)
+        new['host']=self.host_edit.text(); new['out_port']=self.out_port_edit.value(); new['in_port']=self.in_port_edit.value(); new['device'] = self.device_box.currentData(); new['model_path'] = self.model_box.currentData() 
+        with open(SETTINGS_FILE,'w') as f: json.dump(new,f,indent=2)
+        self._config_stamps[SETTINGS_FILE] = self._file_stamp(SETTINGS_FILE)
+        self._apply_settings(new)
         self.log(f"Settings saved: out {self.settings['host']}:{self.settings['out_port']}, in {self.settings['in_port']}")
-        
-        if self.listening:
-            self.voice.stop()
-        self.voice = VoiceRecognizer(self.on_phrase_detected, self.on_partial_phrase_dedected, model_path=self.settings['model_path'], device=self.settings['device'])
-        if self.listening:
-            self.voice.start()
-
 
         QtWidgets.QMessageBox.information(self,'Saved','Settings updated.')
 
-    def _load_commands(self):
+    def _apply_settings(self, new):
+        """Apply only what changed, the model is reloaded only when model_path changes."""
+        old, self.settings = self.settings, new
+        changed = {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+        if not changed:
+            return changed
+        if changed & {'host', 'out_port'}:
+            self.osc = OSCSender(new['host'], new['out_port'])
+            self.paced.sender = self.osc
+        self.paced.rate = new['preset_rate']; self.paced.batch = new['preset_batch']
+        if 'in_port' in changed:
+            self._stop_osc_listener()
+            self._start_osc_listener()
+        if changed & {'oscquery', 'oscquery_port'}:
+            self.param_resolver = self._create_param_resolver()
+        if 'metrics_port' in changed:
+            if self.metrics_server is not None:
+                self.metrics_server.stop(); self.metrics_server = None
+            self._start_metrics_server()
+        if changed & {'blackbox_minutes', 'blackbox_file'}:
+            # closes the old box once the voice thread is done with the current block,
+            # before the new one may truncate the same file
+            self.voice.blackbox = None
+            self.blackbox = self._create_blackbox()
+            self.voice.blackbox = self.blackbox
+        if 'model_path' in changed:
+            if self.listening:
+                self.voice.stop()
+            self.voice = self._create_voice()
+            if self.listening:
+                self.voice.start()
+        else:
+            if 'gate_params' in changed:
+                self._apply_gates(self.voice)
+            if 'endpointing' in changed:
+                self._apply_endpointing()
+            if 'idle_unload_minutes' in changed:
+                self.voice.idle_unload_s = new['idle_unload_minutes'] * 60
+            if 'wake_level' in changed:
+                self.voice.wake_level = new['wake_level']
+            if changed & {'device', 'audio_source', 'audio_port', 'audio_jitter_ms'}:
+                # reopen the input stream, the loaded model is kept
+                self.voice.device = new.get('device')
+                self.voice.source = self._create_audio_source()
+                if self.listening:
+                    self.voice.stop(); self.voice.start()
+        # keep the settings form in sync with hand edits
+        self.host_edit.setText(new['host']); self.out_port_edit.setValue(new['out_port']); self.in_port_edit.setValue(new['in_port'])
+        idx = self.model_box.findData(new['model_path'])
+        if idx >= 0: self.model_box.setCurrentIndex(idx)
+        idx = self.device_box.findData(new.get('device'))
+        if idx >= 0: self.device_box.setCurrentIndex(idx)
+        return changed
+
+    @staticmethod
+    def _file_stamp(path):
         try:
-            with open('commands.json') as f: raw=json.load(f)
-        except: raw={'mappings':[]}
-        self.command_data=[{
-            'phrase':m.get('phrase',''),
-            'actions':m.get('actions',[]),
-            'enabled':m.get('enabled',True),
-            'scope':m.get('scope','global'),
-            'in_sentence': m.get('in_sentence', False)
-        } for m in raw.get('mappings',[])]
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _check_config_files(self):
+        for path, apply in ((COMMANDS_FILE, self._reload_commands),
+                            (SETTINGS_FILE, self._reload_settings),
+                            (MODULE_SETTINGS_FILE, self._reload_module_settings)):
+            stamp = self._file_stamp(path)
+            if stamp is None or stamp == self._config_stamps.get(path):
+                continue
+            self._config_stamps[path] = stamp
+            t0 = now()
+            try:
+                apply()
+            except Exception as e:
+                self.log(f"Reloading {path} failed: {e}")
+                continue
+            self.log(f"Reloaded {path} in {(now() - t0) * 1000:.1f} ms")
+
+    def _reload_commands(self):
+        self.command_data = load_commands(COMMANDS_FILE, strict=True)
+        compiled, reused = self.commands.update(self.command_data)
+        self._populate_cmd_list()
+        self.log(f"{len(self.command_data)} commands, {compiled} recompiled, {reused} unchanged")
+
+    def _reload_settings(self):
+        changed = self._apply_settings(self._read_settings(strict=True))
+        self.log(f"Settings changed: {', '.join(sorted(changed)) or 'nothing'}")
+
+    def _reload_module_settings(self):
+        self._load_module_settings(strict=True)
+        self._apply_endpointing()
+
+    def _load_commands(self):
+        self.command_data = load_commands(COMMANDS_FILE)
+        self.commands = CommandSet(self.command_data)
 
     def _populate_cmd_list(self):
         self.cmd_list.clear()
@@ -326,38 +561,103 @@ class MainWindow(QMainWindow):
                 self.cmd_list.setItemWidget(item, widget)
 
     def _save_commands(self):
-        data = {'mappings': []}
-        for cmd in self.command_data:
-            data['mappings'].append({
-                'phrase': cmd['phrase'],
-                'actions': cmd['actions'],
-                'enabled':  cmd['enabled'],
-                'scope':    cmd['scope'],
-                'in_sentence': cmd['in_sentence']
-            })
-        with open('commands.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        self.commands.update(self.command_data)
+        save_commands(self.command_data, COMMANDS_FILE)
+        self._config_stamps[COMMANDS_FILE] = self._file_stamp(COMMANDS_FILE)
 
     
 
     def _start_osc_listener(self):
         disp = Dispatcher()
-        disp.map('/avatar/change', self._emit_avatar_changed)
-        disp.map('/avatar/parameters/name', self._emit_avatar_loaded)
-        disp.map('/avatar/parameters/*',   self._on_param_changed)
+        # handlers run on the server's per-packet threads, so that is what gets profiled
+        disp.map('/avatar/change', profiler.wrap_handler(self._emit_avatar_changed, "osc"))
+        disp.map('/avatar/parameters/name', profiler.wrap_handler(self._emit_avatar_loaded, "osc"))
+        disp.map('/avatar/parameters/*',   profiler.wrap_handler(self._on_param_changed, "osc"))
 
         addr=('0.0.0.0',self.settings['in_port'])
         try:
             server=osc_server.ThreadingOSCUDPServer(addr,disp)
-            threading.Thread(target=server.serve_forever,daemon=True).start()
+            threading.Thread(target=server.serve_forever,daemon=True,name="osc").start()
+            self.osc_server = server
             self.log(f"OSC listener on port {self.settings['in_port']}")
         except Exception as e:
             self.log(f"Listener error: {e}")
 
+    def _stop_osc_listener(self):
+        if self.osc_server is not None:
+            self.osc_server.shutdown(); self.osc_server.server_close()
+            self.osc_server = None
+
+
+    def _start_metrics_server(self):
+        port = self.settings['metrics_port']
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(port)
+            self.metrics_server.start()
+            self.log(f"Metrics on http://127.0.0.1:{port}/metrics")
+        except Exception as e:
+            self.log(f"Metrics server error: {e}")
 
     def _on_param_changed(self, unused_addr, value):
         # store every incoming parameter value by its OSC path
+        metrics.osc_received.inc()
         self.param_values[unused_addr] = value
+        rec = self.recorder
+        if rec is not None:
+            rec.record(unused_addr, value)
+        gate = self.gate_lookup.get(unused_addr)
+        if gate is not None:
+            name, closing = gate
+            closed = bool(value) == closing
+            if closed != (name in self.voice.closed_gates):
+                self.voice.set_gate(name, closed)
+                self.log(f"Recognition gate '{name}' {'closed' if closed else 'opened'} by {unused_addr}")
+
+    def toggle_recording(self):
+        if self.recorder is not None:
+            rec, self.recorder = self.recorder, None
+            rec.close()
+            self.rec_btn.setText("Start Recording")
+            self.log(f"Recording stopped: {rec.count} parameter changes saved to {rec.path}")
+            return
+        default = datetime.now().strftime('recording-%Y%m%d-%H%M%S')
+        name, ok = QInputDialog.getText(self, "Action Recording", "Recording name:", text=default)
+        if not ok or not name.strip():
+            return
+        self.recorder = ParamRecorder(recording_path(name.strip()))
+        self.rec_btn.setText("Stop Recording")
+        self.log(f"Recording avatar parameters to {self.recorder.path}")
+
+    def _preset_names(self):
+        names = set(self.presets.get('global', {}))
+        names.update(self.presets.get(self.current_avatar_id, {}))
+        return sorted(names)
+
+    def save_preset(self):
+        state = snapshot(self.param_values, self.available_params)
+        if not state:
+            QMessageBox.information(self, 'Avatar Preset', 'No avatar parameters received yet.')
+            return
+        name, ok = QInputDialog.getText(self, "Avatar Preset", f"Preset name ({len(state)} parameters):")
+        if not ok or not name.strip():
+            return
+        avatar = self.current_avatar_id or 'global'
+        self.presets.setdefault(avatar, {})[name.strip().lower()] = state
+        save_presets(self.presets, PRESETS_FILE)
+        self.log(f"Saved preset '{name.strip().lower()}' with {len(state)} parameters for {avatar}")
+
+    def _later(self, delay_s, fn, *args):
+        # presets and replays start on the GUI thread, whichever thread asked for them
+        self.scheduleCall.emit(delay_s, lambda: fn(*args))
+
+    @pyqtSlot(float, object)
+    def _on_schedule_call(self, delay_s, fn):
+        if delay_s > 0:
+            QTimer.singleShot(int(delay_s * 1000), fn)
+        else:
+            fn()
 
 
     def _on_avatar_change(self,unused,avatar_id):
@@ -391,34 +691,29 @@ class MainWindow(QMainWindow):
         self._auto_load_avatar_config(avatar_id_str)
         self._populate_cmd_list()
 
+    def _create_param_resolver(self):
+        client = None
+        if self.settings['oscquery']:
+            client = OSCQueryClient(port=self.settings['oscquery_port'] or None)
+        return AvatarParamResolver(client)
+
     def _auto_load_avatar_config(self,avatar_id):
-        root=os.path.join(os.path.expanduser('~'),'AppData','LocalLow','VRChat','VRChat','OSC')
-        try:
-            users=[d for d in os.listdir(root) if d.startswith('usr_')]
-            users.sort(key=lambda u:os.path.getmtime(os.path.join(root,u)),reverse=True)
-            cfg=os.path.join(root,users[0],'Avatars',f'{avatar_id}.json')
-            self.log(f"Loading avatar config: {cfg}")
-            if not os.path.isfile(cfg): raise FileNotFoundError(cfg)
-            txt=open(cfg).read().strip()
-            if not txt: raise ValueError("Empty file")
-            raw = open(cfg, 'rb').read()               # read as bytes
-            print(repr(raw[:10]))                       # dump the first few bytes
-            txt = raw.decode('utf‑8-sig', errors='replace') # or try 'utf‑8‑sig'
-            data = json.loads(txt)
-            params = []
-            for p in data.get('parameters', []):
-                inp = p.get('input', {})
-                if 'address' in inp:
-            # save both address and declared type
-                    params.append({'address': inp['address'], 'type':    inp.get('type','Float')
-            })
-            self.available_params = params
-            self.remove_Warning()
-        except Exception as e:
-            self.log(f"Auto-load failed: {e}")
+        # runs in the background, results arrive through paramsResolved
+        self.param_resolver.resolve(avatar_id, self.paramsResolved.emit)
+
+    @pyqtSlot(str, object, str)
+    def _on_params_resolved(self, avatar_id, params, source):
+        if avatar_id != self.current_avatar_id:
+            return
+        if params is None:
+            self.log(f"Auto-load failed: {source}")
+            return
+        self.available_params = params
+        self.log(f"Loaded {len(params)} avatar parameters from {source}")
+        self.remove_Warning()
 
     def add_command(self):
-        dlg=AddCommandDialog(self,available_params=self.available_params,current_avatar=self.current_avatar_id)
+        dlg=AddCommandDialog(self,available_params=self.available_params,current_avatar=self.current_avatar_id,preset_names=self._preset_names())
         if dlg.exec_():
             phrase, acts, scope = dlg.get_result()
             self.command_data.append({
@@ -444,7 +739,8 @@ class MainWindow(QMainWindow):
             actions=cmd['actions'],
             available_params=self.available_params,
             current_avatar=self.current_avatar_id,
-            initial_scope=cmd['scope']
+            initial_scope=cmd['scope'],
+            preset_names=self._preset_names()
         )
         if dlg.exec_():
             new_phrase, new_actions, new_scope = dlg.get_result()
@@ -484,6 +780,7 @@ class MainWindow(QMainWindow):
                 self.module_settings['stt_activation__phrase'], self.module_settings['stt_mode'], self.module_settings['send_confirm'] = dlg.getResult()
                 self.log(f"Set stt_activation__phrase to: {self.module_settings['stt_activation__phrase']}. Set stt_mode to: {self.module_settings['stt_mode']}. Set send_confirm to: {self.module_settings['send_confirm']}.")
                 self._save_module_settings()
+                self._apply_endpointing()
 
     def _on_item_toggled(self,it):
         for cmd in self.command_data:
@@ -499,111 +796,20 @@ class MainWindow(QMainWindow):
 
 
     def _match_execution_criteria(self, phrase_F, cmd_phrase, in_sentence):
-        self.log("got sentence with: " + phrase_F + cmd_phrase)
-        if(not in_sentence):
-            if "/" in cmd_phrase:
-                cmd_single = cmd_phrase.split("/")
-                for cmd_single_word in cmd_single:
-                    self.log("Check1.5: " + cmd_single_word + " == " + phrase_F)
-                    if cmd_single_word == phrase_F:
-                        self.log("Matches sentence")
-                        return True
-            else:
-                self.log("Check1: " + phrase_F + " == " + cmd_phrase)
-                if phrase_F == cmd_phrase:
-                    self.log("Matches sentence")
-                    return True
-        else:
-            match_count = 0
-            phrase_words = phrase_F.split(" ")
-            cmd_words = cmd_phrase.split(" ")
-            cmd_length = len(cmd_words)
-            for word in phrase_words:
-                
-                for cmds in cmd_words:
-                    if "/" in cmds:
-                        cmd_single = cmds.split("/")
-                        for cmd_single_word in cmd_single:
-                            self.log("Check2: " + cmd_single_word + " == " + word)
-                            if cmd_single_word == word:
-                                match_count += 1
-                                cmd_words.remove(cmds)
-                                break
-                    else:
-                        self.log("Check3: " + cmds + " == " + word)
-                        if cmds == word:
-                            match_count += 1
-                            cmd_words.remove(cmds)
-
-                    
-                    
-            if match_count >= cmd_length:
-                self.log(f"Matches sentence. Got {match_count} out of {cmd_length} matches")
-                return True
-            else:
-                self.log(f"Doesn't match sentence. Got {match_count} out of {cmd_length} matches")
-                return False
+        return match_execution_criteria(phrase_F, cmd_phrase, in_sentence)
 
     def on_phrase_detected(self,phrase):
-        for cmd in self.command_data:
-            
-            if cmd['enabled'] and (cmd['scope']=='global' or cmd['scope']==self.current_avatar_id):
-                if self._match_execution_criteria(phrase, cmd['phrase'], cmd['in_sentence']):
-                    for act in cmd['actions']:
-                        if act['action_type'] != "Chatbox":
-                            if (act['path'] == ""): continue
-                            path = act['path']
-                            if act.get('toggle'):
-                                # invert last‑known bool (default False)
-                                cur   = bool(self.param_values.get(path, False))
-                                new_v = not cur
-                            else:
-                                if (act['value'] == ""): continue
-                                new_v = act['value']
-
-                            delay_s = act.get('delay', 0) or 0
-                            self.scheduleOSC.emit(path, new_v, delay_s)
-                        else:
-                            path = act['path']
-                            delay_s = act.get('delay', 0) or 0
-                            self.scheduleOSC.emit("/chatbox/input", [path, True, True], delay_s)
-        #stt
-        #self.log(f"mode {self.module_settings['stt_mode']} confirm: {self.module_settings['send_confirm']}")
-
-        if self.module_settings['stt_mode'] == 'ON':
-            if (self.module_settings['send_confirm'] == 'NORMAL' or self.module_settings['send_confirm'] == 'LIVE'):
-                self.scheduleOSC.emit("/chatbox/input", [phrase, True, True], 0)
-                self.lastChatboxmessage = ''
-            if self.module_settings['send_confirm'] == 'CONFIRM':
-                self.scheduleOSC.emit("/chatbox/input", [phrase, False, True], 0)
-            
-        elif self.module_settings['stt_mode'] == 'TRIGGER':
-            if self.module_settings['stt_activation__phrase'] in phrase:
-                preChatboxActivation, postChatboxActivation = phrase.split(self.module_settings['stt_activation__phrase'], 1)
-                if (self.module_settings['send_confirm'] == 'NORMAL' or self.module_settings['send_confirm'] == 'LIVE'):
-                    self.scheduleOSC.emit("/chatbox/input", [postChatboxActivation, True, True], 0)
-                    self.lastChatboxmessage = ''
-                if self.module_settings['send_confirm'] == 'CONFIRM':
-                    self.scheduleOSC.emit("/chatbox/input", [postChatboxActivation, False, True], 0)
-                
+        param_types = {p['address']: p['type'] for p in self.available_params}
+        self.actions.on_phrase(phrase, param_types)
+        self.modules.final(phrase)
 
     def on_partial_phrase_dedected(self,phrase):
-        if len(self.lastChatboxmessage) + 25 <= len(phrase):
-            if self.module_settings['stt_mode'] == 'ON':
-                if (self.module_settings['send_confirm'] == 'LIVE'):
-                    self.scheduleOSC.emit("/chatbox/input", [phrase, True, False], 0)
-                    self.lastChatboxmessage = phrase
-                
-            elif self.module_settings['stt_mode'] == 'TRIGGER':
-                if self.module_settings['stt_activation__phrase'] in phrase:
-                    preChatboxActivation, postChatboxActivation = phrase.split(self.module_settings['stt_activation__phrase'], 1)
-                    if (self.module_settings['send_confirm'] == 'LIVE'):
-                        self.scheduleOSC.emit("/chatbox/input", [postChatboxActivation, True, False], 0)
-                        self.lastChatboxmessage = phrase
-
-
-    @pyqtSlot(str, object, float)
-    def _on_schedule_osc(self, path, new_v, delay_s):
+        self.modules.partial(phrase)
+
+
+    @pyqtSlot(str, object, float, float)
+    def _on_schedule_osc(self, path, new_v, delay_s, emitted_at):
+        metrics.stage["signal"].since(emitted_at)
         delay_ms = int(delay_s * 1000)
 
         if delay_ms > 0:
@@ -622,17 +828,23 @@ class MainWindow(QMainWindow):
         self.logSignal.emit(msg)
 
 class AddCommandDialog(QDialog):
-    def __init__(self,parent=None,phrase="",actions=None,available_params=None,current_avatar=None,initial_scope='global'):
+    def __init__(self,parent=None,phrase="",actions=None,available_params=None,current_avatar=None,initial_scope='global',preset_names=None):
         super().__init__(parent)
         self.setWindowTitle("Command Editor")
         self.resize(900,700)
         self.available_params=available_params or []
+        self.preset_names=preset_names or []
         self.current_avatar=current_avatar
         self.initial_scope=initial_scope
         layout=QVBoxLayout(self)
         layout.addWidget(QLabel("Voice Phrase:"))
         self.phrase_edit=QLineEdit(phrase)
         layout.addWidget(self.phrase_edit)
+        slots_help=QLabel('Slots: "set hue to {number}" captures a spoken number, "{side:left|right}" one of the words. '
+                          'As a value, "{number}" is sent as spoken (a Float is clamped to -1..1, "zero point five" is 0.5); '
+                          '"{number:0..100}" maps that spoken range onto the parameter, e.g. for percent.')
+        slots_help.setWordWrap(True)
+        layout.addWidget(slots_help)
         scope_layout=QHBoxLayout()
         self.global_rb=QRadioButton("Global")
         self.avatar_rb=QRadioButton("Avatar-specific")
@@ -657,6 +869,20 @@ class AddCommandDialog(QDialog):
         self.chatbox_table.horizontalHeader().setSectionResizeMode(0,QHeaderView.Stretch)
         layout.addWidget(self.chatbox_table)
 
+        #recording replays
+        self.replay_table = QTableWidget(0,5)
+        self.replay_table.setColumnHidden(4, True)
+        self.replay_table.setHorizontalHeaderLabels(["Recording","Speed","Address filter","Delay","action_type"])
+        self.replay_table.horizontalHeader().setSectionResizeMode(0,QHeaderView.Stretch)
+        layout.addWidget(self.replay_table)
+
+        #avatar presets
+        self.preset_table = QTableWidget(0,3)
+        self.preset_table.setColumnHidden(2, True)
+        self.preset_table.setHorizontalHeaderLabels(["Avatar preset","Delay","action_type"])
+        self.preset_table.horizontalHeader().setSectionResizeMode(0,QHeaderView.Stretch)
+        layout.addWidget(self.preset_table)
+
 
         if actions:
             for act in actions:
@@ -667,6 +893,10 @@ class AddCommandDialog(QDialog):
 
                 if action_type == "Chatbox":
                     self.add_action_row(path=path, delay=str(delay), action_type=action_type)
+                elif action_type == "Preset":
+                    self.add_action_row(path=path, delay=str(delay), action_type=action_type)
+                elif action_type == "Replay":
+                    self.add_action_row(path=path, value=str(act.get('value', 1.0)), delay=str(delay), action_type=action_type, filter=act.get('filter', ''))
                 else:
                     valstr = str(act.get('value','0')) 
                     toggl  = act.get('toggle', False)
@@ -680,16 +910,59 @@ class AddCommandDialog(QDialog):
 
         add_ctbx_btn = QPushButton("Add Chatbox event") 
         add_ctbx_btn.clicked.connect(lambda: self.add_action_row(action_type="Chatbox"))
-        btns.addWidget(add_ctbx_btn); layout.addLayout(btns)
+        btns.addWidget(add_ctbx_btn)
+
+        add_replay_btn = QPushButton("Add Recording replay")
+        add_replay_btn.clicked.connect(lambda: self.add_action_row(value="1.0", action_type="Replay"))
+        btns.addWidget(add_replay_btn)
+
+        add_preset_btn = QPushButton("Add Avatar preset")
+        add_preset_btn.clicked.connect(lambda: self.add_action_row(action_type="Preset"))
+        btns.addWidget(add_preset_btn); layout.addLayout(btns)
 
         ok_cancel=QDialogButtonBox(QDialogButtonBox.Ok|QDialogButtonBox.Cancel)
         ok_cancel.accepted.connect(self.accept); ok_cancel.rejected.connect(self.reject)
         layout.addWidget(ok_cancel)
 
 
-    def add_action_row(self, path="", value="0", toggle=False, delay="0", action_type="OSC", *_args):
+    def add_action_row(self, path="", value="0", toggle=False, delay="0", action_type="OSC", filter="", *_args):
         
-        if(action_type != "Chatbox"):
+        if action_type == "Preset":
+            row = self.preset_table.rowCount()
+            self.preset_table.insertRow(row)
+
+            combo = QComboBox(); combo.setEditable(True)
+            combo.addItems(self.preset_names)
+            combo.setCurrentText(path)
+            self.preset_table.setCellWidget(row, 0, combo)
+
+            delay_item = QLineEdit(str(delay))
+            delay_item.setValidator(QDoubleValidator(0.0, 999.0, 2))
+            self.preset_table.setCellWidget(row, 1, delay_item)
+
+            self.preset_table.setCellWidget(row, 2, QLineEdit(action_type))
+        elif action_type == "Replay":
+            row = self.replay_table.rowCount()
+            self.replay_table.insertRow(row)
+
+            combo = QComboBox(); combo.setEditable(True)
+            combo.addItems(list_recordings())
+            combo.setCurrentText(path)
+            self.replay_table.setCellWidget(row, 0, combo)
+
+            speed_edit = QLineEdit(value)
+            speed_edit.setValidator(QDoubleValidator(0.01, 100.0, 2))
+            self.replay_table.setCellWidget(row, 1, speed_edit)
+
+            # comma separated fnmatch patterns, empty replays everything
+            self.replay_table.setCellWidget(row, 2, QLineEdit(filter))
+
+            delay_item = QLineEdit(str(delay))
+            delay_item.setValidator(QDoubleValidator(0.0, 999.0, 2))
+            self.replay_table.setCellWidget(row, 3, delay_item)
+
+            self.replay_table.setCellWidget(row, 4, QLineEdit(action_type))
+        elif(action_type != "Chatbox"):
             row = self.actions_table.rowCount()
             self.actions_table.insertRow(row)
 
@@ -768,16 +1041,7 @@ class AddCommandDialog(QDialog):
             if toggle: #todo check for actiontype
                 actions.append({'path': path, 'toggle': True, 'delay':delay, 'action_type': action_type})
             else:
-                vs = self.actions_table.cellWidget(r,1).text().strip().lower()
-                
-                if vs in ("true","false"):
-                    v = (vs=="true")
-                else:
-                    try:    v = int(vs)
-                    except: 
-                        try: v = float(vs)
-                        except: v = 0
-                
+                v = parse_value(self.actions_table.cellWidget(r,1).text())
                 actions.append({'path': path, 'value': v, 'toggle': False, 'delay': delay, 'action_type': action_type})
         for r in range(self.chatbox_table.rowCount()):
             path = self.chatbox_table.cellWidget(r,0).currentText().strip()
@@ -790,6 +1054,31 @@ class AddCommandDialog(QDialog):
                 delay = 0.0
 
             actions.append({'path': path, 'delay': delay, 'action_type': action_type})
+        for r in range(self.replay_table.rowCount()):
+            path = self.replay_table.cellWidget(r,0).currentText().strip()
+            patterns = self.replay_table.cellWidget(r,2).text().strip()
+            action_type = self.replay_table.cellWidget(r, 4).text()
+
+            try:
+                speed = float(self.replay_table.cellWidget(r,1).text())
+            except ValueError:
+                speed = 1.0
+            try:
+                delay = float(self.replay_table.cellWidget(r,3).text())
+            except ValueError:
+                delay = 0.0
+
+            actions.append({'path': path, 'value': speed, 'filter': patterns, 'delay': delay, 'action_type': action_type})
+        for r in range(self.preset_table.rowCount()):
+            path = self.preset_table.cellWidget(r,0).currentText().strip().lower()
+            action_type = self.preset_table.cellWidget(r, 2).text()
+
+            try:
+                delay = float(self.preset_table.cellWidget(r,1).text())
+            except ValueError:
+                delay = 0.0
+
+            actions.append({'path': path, 'delay': delay, 'action_type': action_type})
 
         return phrase, actions, scope
 
@@ -0,0 +1,248 @@
+# metrics.py
+import threading
+from bisect import bisect_left
+from time import perf_counter as now  # monotonic, high resolution
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond queue hops up to slow decodes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PREFIX = "voicetoosc_"
+
+# Recording is lock-free on purpose: a plain += under the GIL costs well under a
+# microsecond. Two threads hitting the same counter at the exact same moment can
+# lose an increment, which is acceptable for monitoring numbers.
+
+
+def _fmt_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Counter:
+    __slots__ = ("value",)
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def render(self, name, labels):
+        return [f"{name}_total{_fmt_labels(labels)} {self.value}"]
+
+
+class Gauge:
+    __slots__ = ("value",)
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, v):
+        self.value = v
+
+    def render(self, name, labels):
+        return [f"{name}{_fmt_labels(labels)} {self.value}"]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def since(self, t0):
+        """Observe the time elapsed since t0 (a value returned by now())."""
+        self.observe(now() - t0)
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket."""
+        total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for i, c in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if seen + c >= rank and c:
+                return lower + (upper - lower) * ((rank - seen) / c)
+            seen += c
+            lower = upper
+        return lower
+
+    def render(self, name, labels):
+        lines = []
+        cum = 0
+        for le, c in zip(self.buckets, self.counts):
+            cum += c
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', le))} {cum}")
+        cum += self.counts[-1]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {cum}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self._families = {}  # name -> (kind, help, {labels_tuple: metric})
+        self._lock = threading.Lock()  # only taken when a metric is created
+
+    def _get(self, cls, name, help_text, labels):
+        key = tuple(sorted(labels.items())) if labels else ()
+        fam = self._families.get(name)
+        if fam is not None:
+            metric = fam[2].get(key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            fam = self._families.setdefault(name, (cls.kind, help_text, {}))
+            return fam[2].setdefault(key, cls())
+
+    def counter(self, name, help_text="", **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", **labels):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text="", **labels):
+        return self._get(Histogram, name, help_text, labels)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        out = []
+        for name, (kind, help_text, series) in list(self._families.items()):
+            full = PREFIX + name
+            exposed = full + "_total" if kind == "counter" else full
+            if help_text:
+                out.append(f"# HELP {exposed} {help_text}")
+            out.append(f"# TYPE {exposed} {kind}")
+            for labels, metric in list(series.items()):
+                out.extend(metric.render(full, labels))
+        return "\n".join(out) + "\n"
+
+
+# Process wide registry, shared by the voice, OSC and GUI threads
+metrics = Metrics()
+
+# Pipeline stages, in the order audio flows through them
+# network: remote capture client's send time to leaving the jitter buffer (netaudio.py)
+STAGES = ("capture", "network", "queue", "decode", "match", "signal", "send")
+stage = {s: metrics.histogram("stage_seconds", "Time spent in each pipeline stage", stage=s) for s in STAGES}
+
+utterances   = metrics.counter("utterances", "Final recognition results")
+partials     = metrics.counter("partials", "Partial recognition results")
+osc_sent     = metrics.counter("osc_sent", "OSC messages sent")
+osc_received = metrics.counter("osc_received", "OSC messages received")
+audio_blocks = metrics.counter("audio_blocks", "Audio blocks captured")
+audio_dropped = metrics.counter("audio_dropped", "Audio blocks flagged with overflow or other stream errors")
+queue_depth  = metrics.gauge("audio_queue_depth", "Audio blocks waiting for the decoder")
+model_loaded = metrics.gauge("model_loaded", "1 while the Vosk model is resident, 0 after an idle unload")
+gate_open    = metrics.gauge("gate_open", "1 while recognition is enabled, 0 while an OSC gate (mute, AFK, ...) pauses it")
+gated_blocks = metrics.counter("gated_blocks", "Audio blocks skipped without decoding because a gate was closed")
+gate_open.set(1)
+
+# filled by endpoint_latency(), one histogram per endpointing profile in use
+endpoint = {}
+
+
+def endpoint_latency(profile):
+    h = endpoint.get(profile)
+    if h is None:
+        h = endpoint[profile] = metrics.histogram(
+            "endpoint_latency_seconds", "Time from the end of speech to the final result, by endpointing profile",
+            profile=profile)
+    return h
+
+
+# module name -> stats() of its ModuleRunner (modules/pipeline.py), while it runs
+modules = {}
+
+net_packets  = metrics.counter("net_audio_packets", "Audio packets received from a remote capture client")
+net_lost     = metrics.counter("net_audio_lost", "Remote audio blocks never received, replaced by silence")
+net_late     = metrics.counter("net_audio_late", "Remote audio packets that arrived after their slot was concealed")
+net_jitter   = metrics.gauge("net_audio_jitter_seconds", "Interarrival jitter of remote audio (RFC 3550 estimate)")
+
+
+def summary():
+    """Short human readable digest for the GUI panel."""
+    lines = []
+    for s in STAGES:
+        h = stage[s]
+        if s == "network" and not h.count:
+            continue  # only shown with a remote capture client
+        lines.append(
+            f"{s:<8} n={h.count:<6} avg {h.mean()*1000:7.2f} ms  "
+            f"p50 {h.quantile(0.5)*1000:7.2f} ms  p95 {h.quantile(0.95)*1000:7.2f} ms"
+        )
+    lines.append(
+        f"utterances {utterances.value}  partials {partials.value}  "
+        f"osc sent {osc_sent.value}  received {osc_received.value}"
+    )
+    lines.append(f"queue depth {queue_depth.value}  dropped audio {audio_dropped.value}")
+    for name, h in sorted(endpoint.items()):
+        if h.count:
+            lines.append(f"endpoint {name:<9} n={h.count:<5} avg {h.mean()*1000:7.1f} ms  p95 {h.quantile(0.95)*1000:7.1f} ms")
+    for name, stats in sorted(modules.items()):
+        s = stats()
+        lines.append(f"module {name:<9} final avg {s['final_ms']:6.1f} ms  partial avg {s['partial_ms']:6.1f} ms  "
+                     f"coalesced {s['coalesced']}  dropped {s['dropped']}  over budget {s['over_budget']}")
+    if net_packets.value:
+        lines.append(f"remote audio {net_packets.value} packets  lost {net_lost.value}  "
+                     f"late {net_late.value}  jitter {net_jitter.value*1000:.1f} ms")
+    return "\n".join(lines)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # keep scrapes out of the console
+
+
+class MetricsServer:
+    """Serves /metrics on localhost for Prometheus or a quick curl."""
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,71 @@
+# modules/chatbox.py
+import json
+from modules.pipeline import Module
+
+CHATBOX_INPUT = "/chatbox/input"
+LIVE_STEP = 25  # a live partial is resent once it grew by this many characters
+
+
+class ChatboxRelay(Module):
+    """
+    Speech to Chatbox without Qt, shared by the window and the daemon.
+
+    settings is the module_settings dict (stt_mode, stt_activation__phrase,
+    send_confirm) and is read on every phrase, so edits apply right away.
+    send(path, value) puts a message on the wire or schedules it.
+    """
+
+    name = "chatbox"
+
+    def __init__(self, settings, send):
+        self.settings = settings
+        self.send = send
+        self.last_message = ''
+
+    def _text(self, phrase):
+        """What to relay from phrase in the current mode, None when nothing."""
+        mode = self.settings['stt_mode']
+        if mode == 'ON':
+            return phrase
+        if mode == 'TRIGGER':
+            trigger = self.settings['stt_activation__phrase']
+            if trigger in phrase:
+                return phrase.split(trigger, 1)[1]
+        return None
+
+    def on_final(self, phrase):
+        text = self._text(phrase)
+        if text is None:
+            return
+        confirm = self.settings['send_confirm']
+        if confirm == 'NORMAL' or confirm == 'LIVE':
+            self.send(CHATBOX_INPUT, [text, True, True])
+            self.last_message = ''
+        if confirm == 'CONFIRM':
+            self.send(CHATBOX_INPUT, [text, False, True])
+
+    def on_partial(self, phrase):
+        if len(self.last_message) + LIVE_STEP > len(phrase):
+            return
+        if self.settings['send_confirm'] != 'LIVE':
+            return
+        text = self._text(phrase)
+        if text is not None:
+            self.send(CHATBOX_INPUT, [text, True, False])
+            self.last_message = phrase
+
+
+def read_module_settings(path, strict=False):
+    """strict=True raises OSError / ValueError instead of falling back to the defaults, for hot reloads."""
+    try:
+        with open(path) as f: module_settings = json.load(f)
+        if not isinstance(module_settings, dict):
+            raise ValueError(f"{path}: expected an object")
+    except (OSError, ValueError):
+        if strict:
+            raise
+        module_settings = {}
+    module_settings.setdefault('stt_mode', 'OFF') #OFF, TRIGGER, ON
+    module_settings.setdefault('stt_activation__phrase', 'status')
+    module_settings.setdefault('send_confirm', 'NORMAL') #NORMAL, CONFIRM, LIVE
+    return module_settings
@@ -0,0 +1,155 @@
+# modules/pipeline.py
+import sys
+import threading
+from collections import deque
+
+import metrics
+from metrics import now
+
+FINAL = "final"
+PARTIAL = "partial"
+
+
+class Module:
+    """
+    Something that reacts to recognition results, like Speech to Chatbox.
+
+    on_final / on_partial run on the module's own worker thread, never on the
+    voice thread, so they may block; they only hold up this module's events.
+    queue_size bounds how many events wait; budget_s is how long one event
+    should take, runs over it are counted in metrics and reported.
+    """
+    name = "module"
+    queue_size = 16
+    budget_s = 0.05
+
+    def on_final(self, text):
+        pass
+
+    def on_partial(self, text):
+        pass
+
+    def close(self):
+        pass
+
+
+class ModuleRunner:
+    """
+    Feeds one module from a bounded queue on a worker thread.
+
+    Only the newest partial is kept: a new partial replaces one still waiting,
+    and a final replaces every partial still waiting, since it supersedes them.
+    When finals alone fill the queue the oldest one is dropped.
+    """
+
+    def __init__(self, module, queue_size=None, budget_s=None):
+        self.module = module
+        self.name = module.name
+        self.queue_size = queue_size or module.queue_size
+        self.budget_s = module.budget_s if budget_s is None else budget_s
+        self.events = deque()
+        self.cond = threading.Condition()
+        self.running = True
+        labels = {'module': self.name}
+        self.timing = {kind: metrics.metrics.histogram("module_seconds", "Time a module spent per event",
+                                                       event=kind, **labels) for kind in (FINAL, PARTIAL)}
+        self.waiting = metrics.metrics.histogram("module_wait_seconds", "Time an event waited in a module's queue", **labels)
+        self.dropped = metrics.metrics.counter("module_dropped", "Final results a full module queue discarded", **labels)
+        self.coalesced = metrics.metrics.counter("module_coalesced", "Partial results replaced by newer ones before a module got to them", **labels)
+        self.over_budget = metrics.metrics.counter("module_over_budget", "Events a module took longer than its budget for", **labels)
+        self.depth = metrics.metrics.gauge("module_queue_depth", "Events waiting for a module", **labels)
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"module-{self.name}")
+        self.thread.start()
+        metrics.modules[self.name] = self.stats
+
+    def submit(self, kind, text):
+        """Never blocks the caller."""
+        with self.cond:
+            # at most the last event is a partial, every submit replaces it
+            if self.events and self.events[-1][0] == PARTIAL:
+                self.events.pop()
+                self.coalesced.inc()
+            if len(self.events) >= self.queue_size:
+                self.events.popleft()
+                self.dropped.inc()
+            self.events.append((kind, text, now()))
+            self.depth.set(len(self.events))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.events:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                kind, text, queued_at = self.events.popleft()
+                self.depth.set(len(self.events))
+            t0 = now()
+            self.waiting.observe(t0 - queued_at)
+            try:
+                if kind == FINAL:
+                    self.module.on_final(text)
+                else:
+                    self.module.on_partial(text)
+            except Exception as e:
+                print(f"Module {self.name} failed on {kind} result: {e}", file=sys.stderr)
+            elapsed = now() - t0
+            self.timing[kind].observe(elapsed)
+            if elapsed > self.budget_s:
+                self.over_budget.inc()
+                if self.over_budget.value in (1, 10, 100) or self.over_budget.value % 1000 == 0:
+                    print(f"Module {self.name} took {elapsed * 1000:.0f} ms for a {kind} result "
+                          f"(budget {self.budget_s * 1000:.0f} ms, {self.over_budget.value} times so far)")
+
+    def stop(self):
+        metrics.modules.pop(self.name, None)
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join(timeout=1)
+        self.module.close()
+
+    def stats(self):
+        return {
+            'queued': len(self.events),
+            'dropped': self.dropped.value,
+            'coalesced': self.coalesced.value,
+            'over_budget': self.over_budget.value,
+            'final_ms': self.timing[FINAL].mean() * 1000,
+            'partial_ms': self.timing[PARTIAL].mean() * 1000,
+        }
+
+
+class ModulePipeline:
+    """Hands every final and partial result to each module without waiting for any of them."""
+
+    def __init__(self, modules=()):
+        self.runners = {}
+        for module in modules:
+            self.add(module)
+
+    def add(self, module, queue_size=None, budget_s=None):
+        if module.name in self.runners:
+            raise ValueError(f"module {module.name!r} is already running")
+        self.runners[module.name] = ModuleRunner(module, queue_size, budget_s)
+
+    def remove(self, name):
+        runner = self.runners.pop(name, None)
+        if runner is not None:
+            runner.stop()
+
+    def final(self, text):
+        for runner in list(self.runners.values()):
+            runner.submit(FINAL, text)
+
+    def partial(self, text):
+        for runner in list(self.runners.values()):
+            runner.submit(PARTIAL, text)
+
+    def stats(self):
+        return {name: runner.stats() for name, runner in self.runners.items()}
+
+    def stop(self):
+        for name in list(self.runners):
+            self.remove(name)
@@ -0,0 +1,432 @@
+# netaudio.py
+"""
+Remote audio ingest: capture on the game PC, recognize on another machine.
+
+On the game PC (needs only sounddevice, no model):
+    python netaudio.py send --host 192.168.1.20 [--port 9100] [--tcp] [--ulaw] [--device N]
+
+On the recognizing machine, in settings.json:
+    "audio_source": "udp",  (or "tcp", "local" is the microphone)
+    "audio_port": 9100,
+    "host": "<game PC>"     (commands still go back to the game through OSCSender)
+
+Every packet is HEADER + one block of 16 kHz mono audio, either int16 PCM or
+8-bit mu-law (G.711, half the bandwidth). Over TCP each packet is preceded by
+its length as uint16. Sequence numbers let the receiver's JitterBuffer restore
+order and replace lost blocks with silence. The sender's time.time() in every
+packet gives the "network" stage in metrics; across machines that is only
+meaningful with synchronized clocks (NTP), the jitter estimate is not affected.
+"""
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+from array import array
+from collections import deque
+
+import metrics
+from audio_source import MicrophoneSource, SAMPLE_RATE, BLOCK_SIZE
+
+DEFAULT_PORT = 9100
+MAGIC = b"VA"
+VERSION = 1
+CODEC_PCM16 = 0
+CODEC_ULAW = 1
+CODECS = {'pcm': CODEC_PCM16, 'ulaw': CODEC_ULAW}
+HEADER = struct.Struct("<2sBBId")  # magic, version, codec, sequence, sender time.time()
+LENGTH = struct.Struct("<H")       # TCP framing
+SEQ_MOD = 1 << 32
+MAX_CONCEAL = 8                    # blocks of silence inserted for one gap at most (~1.5 s)
+TCP_QUEUE = 16                     # blocks (~3 s) a stalled TCP link may fall behind before the oldest are dropped
+TCP_SEND_TIMEOUT_S = 2
+RECONNECT_MIN_S = 0.5
+RECONNECT_MAX_S = 10
+RESYNC = 256                       # a sequence this far behind means the sender restarted
+
+
+# -- mu-law (G.711) --------------------------------------------------------
+# audioop is gone since Python 3.13, so both directions are table lookups
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+
+
+def _ulaw_encode_sample(s):
+    sign = 0x80 if s < 0 else 0
+    s = min(-s if sign else s, ULAW_CLIP) + ULAW_BIAS
+    exponent = s.bit_length() - 8
+    mantissa = (s >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def _ulaw_decode_sample(u):
+    u = ~u & 0xFF
+    s = ((((u & 0x0F) << 3) + ULAW_BIAS) << ((u >> 4) & 0x07)) - ULAW_BIAS
+    return -s if u & 0x80 else s
+
+
+_ULAW_ENCODE = bytes(_ulaw_encode_sample(s) for s in range(-32768, 32768))
+_ULAW_DECODE = array('h', [_ulaw_decode_sample(u) for u in range(256)])
+
+
+def ulaw_encode(pcm):
+    """int16 PCM bytes -> one mu-law byte per sample."""
+    enc = _ULAW_ENCODE
+    return bytes([enc[s + 32768] for s in array('h', pcm)])
+
+
+def ulaw_decode(data):
+    """mu-law bytes -> int16 PCM bytes."""
+    return array('h', map(_ULAW_DECODE.__getitem__, data)).tobytes()
+
+
+def pack(seq, pcm, codec=CODEC_PCM16, sent_at=None):
+    payload = ulaw_encode(pcm) if codec == CODEC_ULAW else pcm
+    return HEADER.pack(MAGIC, VERSION, codec, seq % SEQ_MOD, time.time() if sent_at is None else sent_at) + payload
+
+
+def unpack(packet):
+    """Returns (seq, sent_at, pcm). Raises ValueError on anything that isn't ours."""
+    if len(packet) < HEADER.size:
+        raise ValueError("short packet")
+    magic, version, codec, seq, sent_at = HEADER.unpack_from(packet)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a VoiceToOSC audio packet")
+    payload = packet[HEADER.size:]
+    if codec == CODEC_ULAW:
+        return seq, sent_at, ulaw_decode(payload)
+    if codec == CODEC_PCM16:
+        return seq, sent_at, bytes(payload)
+    raise ValueError(f"unknown codec {codec}")
+
+
+class JitterBuffer:
+    """
+    Puts blocks back into sequence order.
+
+    Blocks that continue the sequence are released right away, so there is no
+    fixed playout delay. A gap holds back what arrived after it for up to
+    max_wait_s (or until max_blocks are waiting); then the missing blocks count
+    as lost and are replaced by silence of the same length, which keeps the
+    decoder's timeline intact without inventing speech. Blocks that show up
+    after their slot was given up are dropped as late.
+    """
+
+    def __init__(self, max_wait_s=0.08, max_blocks=32):
+        self.max_wait_s = max_wait_s
+        self.max_blocks = max_blocks
+        self.pending = {}  # seq -> (pcm, sent_at)
+        self.concealed = set()  # recently given up sequence numbers, to tell late from duplicate
+        self.next_seq = None
+        self.gap_since = None
+        self.block_bytes = BLOCK_SIZE * 2
+        self.received = self.lost = self.late = self.duplicate = self.reordered = 0
+
+    def reset(self):
+        self.pending.clear()
+        self.concealed.clear()
+        self.next_seq = None
+        self.gap_since = None
+
+    def push(self, seq, pcm, sent_at, t):
+        """Add a packet that arrived at t (monotonic). Returns [(pcm, sent_at or None)] ready for the decoder."""
+        self.received += 1
+        self.block_bytes = len(pcm)
+        if self.next_seq is None:
+            self.next_seq = seq
+        ahead = (seq - self.next_seq) % SEQ_MOD
+        if ahead >= SEQ_MOD // 2:
+            if SEQ_MOD - ahead > RESYNC:
+                self.reset()  # sender restarted and counts from 0 again
+                self.next_seq = seq
+            elif seq in self.concealed:
+                self.concealed.discard(seq)
+                self.late += 1
+                return []
+            else:
+                self.duplicate += 1
+                return []
+        elif seq in self.pending:
+            self.duplicate += 1
+            return []
+        elif ahead == 0 and self.pending:
+            self.reordered += 1  # filled a gap in time
+        self.pending[seq] = (pcm, sent_at)
+        return self.poll(t)
+
+    def poll(self, t):
+        """Release what is ready at t; call it regularly so a trailing gap is given up on."""
+        out = []
+        while self.pending:
+            item = self.pending.pop(self.next_seq, None)
+            if item is not None:
+                out.append(item)
+                self.next_seq = (self.next_seq + 1) % SEQ_MOD
+                self.gap_since = None
+                continue
+            if self.gap_since is None:
+                self.gap_since = t
+            if t - self.gap_since < self.max_wait_s and len(self.pending) < self.max_blocks:
+                break
+            missing = min((s - self.next_seq) % SEQ_MOD for s in self.pending)
+            self.lost += missing
+            if len(self.concealed) > RESYNC:
+                self.concealed.clear()
+            self.concealed.update((self.next_seq + i) % SEQ_MOD for i in range(min(missing, RESYNC)))
+            out.extend([(bytes(self.block_bytes), None)] * min(missing, MAX_CONCEAL))
+            self.next_seq = (self.next_seq + missing) % SEQ_MOD
+            self.gap_since = None
+        return out
+
+
+class NetworkAudioSource:
+    """
+    Audio source for VoiceRecognizer fed by `netaudio.py send` over UDP or TCP.
+    port=0 picks a free port, see .port after start().
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host='0.0.0.0', transport='udp', max_wait_ms=80):
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.buffer = JitterBuffer(max_wait_ms / 1000)
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.jitter = 0.0
+        self._last_transit = None
+
+    def start(self, put):
+        self.put = put
+        if self.transport == 'tcp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind((self.host, self.port))
+            self.sock.listen(1)
+            target = self._serve_tcp
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind((self.host, self.port))
+            target = self._serve_udp
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=target, daemon=True, name="netaudio")
+        self.thread.start()
+        print(f"Listening for remote audio on {self.transport} port {self.port}")
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def stats(self):
+        b = self.buffer
+        h = metrics.stage["network"]
+        return {
+            'received': b.received, 'lost': b.lost, 'late': b.late, 'duplicate': b.duplicate,
+            'reordered': b.reordered, 'jitter_ms': self.jitter * 1000,
+            'latency_p50_ms': h.quantile(0.5) * 1000, 'latency_p95_ms': h.quantile(0.95) * 1000,
+        }
+
+    def _packet(self, packet):
+        arrived = time.time()
+        try:
+            seq, sent_at, pcm = unpack(packet)
+        except ValueError as e:
+            print(f"Dropped remote audio packet: {e}", file=sys.stderr)
+            return
+        metrics.net_packets.inc()
+        # RFC 3550 interarrival jitter, independent of the clock offset between the machines
+        transit = arrived - sent_at
+        if self._last_transit is not None:
+            self.jitter += (abs(transit - self._last_transit) - self.jitter) / 16
+            metrics.net_jitter.set(self.jitter)
+        self._last_transit = transit
+        lost, late = self.buffer.lost, self.buffer.late
+        self._release(self.buffer.push(seq, pcm, sent_at, time.monotonic()))
+        metrics.net_late.inc(self.buffer.late - late)
+        metrics.net_lost.inc(self.buffer.lost - lost)
+
+    def _poll(self):
+        lost = self.buffer.lost
+        self._release(self.buffer.poll(time.monotonic()))
+        metrics.net_lost.inc(self.buffer.lost - lost)
+
+    def _release(self, blocks):
+        for pcm, sent_at in blocks:
+            if sent_at is not None:
+                metrics.stage["network"].observe(max(0.0, time.time() - sent_at))
+            metrics.audio_blocks.inc()
+            self.put(pcm)
+
+    def _serve_udp(self):
+        while self.running:
+            try:
+                packet, _ = self.sock.recvfrom(65536)
+            except socket.timeout:
+                self._poll()
+                continue
+            except OSError:
+                break
+            self._packet(packet)
+
+    def _serve_tcp(self):
+        while self.running:
+            try:
+                conn, addr = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            print(f"Remote audio client connected from {addr[0]}")
+            self.buffer.reset()
+            self._last_transit = None
+            conn.settimeout(0.05)
+            with conn:
+                data = b""
+                while self.running:
+                    try:
+                        chunk = conn.recv(65536)
+                    except socket.timeout:
+                        self._poll()
+                        continue
+                    except OSError:
+                        break
+                    if not chunk:
+                        break
+                    data += chunk
+                    while len(data) >= LENGTH.size:
+                        (n,) = LENGTH.unpack_from(data)
+                        if len(data) < LENGTH.size + n:
+                            break
+                        self._packet(data[LENGTH.size:LENGTH.size + n])
+                        data = data[LENGTH.size + n:]
+            print("Remote audio client disconnected")
+
+
+class AudioStreamClient:
+    """
+    Sends audio blocks to a NetworkAudioSource. send_block() never blocks, so it
+    can be fed straight from the audio callback.
+
+    Over TCP blocks go through a bounded queue to a sender thread, which connects,
+    reconnects with backoff when the link drops, and leaves the oldest blocks
+    behind (counted in dropped) when the peer stalls for longer than the queue holds.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, transport='udp', codec='pcm'):
+        self.addr = (host, port)
+        self.transport = transport
+        self.codec = CODECS[codec]
+        self.seq = 0
+        self.dropped = 0
+        if transport == 'tcp':
+            self.sock = None
+            self._pending = deque()  # framed packets, oldest first
+            self._cond = threading.Condition()
+            self._closing = threading.Event()
+            self.thread = threading.Thread(target=self._tcp_sender, daemon=True, name="audio-send")
+            self.thread.start()
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send_block(self, pcm):
+        packet = pack(self.seq, pcm, self.codec)
+        self.seq = (self.seq + 1) % SEQ_MOD
+        if self.transport == 'tcp':
+            with self._cond:
+                if len(self._pending) >= TCP_QUEUE:
+                    self._pending.popleft()
+                    self.dropped += 1
+                self._pending.append(LENGTH.pack(len(packet)) + packet)
+                self._cond.notify()
+        else:
+            self.sock.sendto(packet, self.addr)
+
+    def _connect(self):
+        sock = socket.create_connection(self.addr, timeout=TCP_SEND_TIMEOUT_S)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _tcp_sender(self):
+        backoff = RECONNECT_MIN_S
+        where = f"{self.addr[0]}:{self.addr[1]}"
+        while True:
+            with self._cond:
+                while not self._closing.is_set() and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # closed, everything sent
+                frame = self._pending[0]  # stays queued until it went out
+            if self.sock is None:
+                if self._closing.is_set():
+                    return
+                try:
+                    self.sock = self._connect()
+                except OSError as e:
+                    print(f"Audio link to {where} failed ({e}), retrying in {backoff:.1f} s")
+                    self._closing.wait(backoff)
+                    backoff = min(backoff * 2, RECONNECT_MAX_S)
+                    continue
+                backoff = RECONNECT_MIN_S
+                print(f"Audio link to {where} up" + (f", {self.dropped} blocks dropped so far" if self.dropped else ""))
+            try:
+                self.sock.sendall(frame)
+            except OSError as e:
+                # a half sent frame leaves the stream unusable, the receiver starts over on a new connection
+                print(f"Audio link to {where} lost ({e}), reconnecting")
+                self.sock.close()
+                self.sock = None
+                continue
+            with self._cond:
+                if self._pending and self._pending[0] is frame:
+                    self._pending.popleft()
+
+    def stream(self, device=None):
+        """Send the microphone until Ctrl+C."""
+        mic = MicrophoneSource(device)
+        mic.start(self.send_block)
+        print(f"Streaming {SAMPLE_RATE} Hz audio to {self.addr[0]}:{self.addr[1]} over {self.transport}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            mic.stop()
+            self.close()
+
+    def close(self):
+        if self.transport == 'tcp':
+            # lets the sender finish what is queued while the link is up
+            self._closing.set()
+            with self._cond:
+                self._cond.notify()
+            self.thread.join(timeout=TCP_SEND_TIMEOUT_S + 1)
+        if self.sock is not None:
+            self.sock.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream this machine's microphone to a remote VoiceToOSC.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    send = sub.add_parser('send')
+    send.add_argument('--host', required=True, help="machine running the recognizer")
+    send.add_argument('--port', type=int, default=DEFAULT_PORT)
+    send.add_argument('--tcp', action='store_true', help="TCP instead of UDP")
+    send.add_argument('--ulaw', action='store_true', help="mu-law, half the bandwidth")
+    send.add_argument('--device', type=int, default=None, help="input device index")
+    args = ap.parse_args()
+    client = AudioStreamClient(args.host, args.port, 'tcp' if args.tcp else 'udp', 'ulaw' if args.ulaw else 'pcm')
+    client.stream(args.device)
+
+
+if __name__ == "__main__":
+    main()
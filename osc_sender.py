@@ -1,5 +1,12 @@
 # osc_sender.py
+import time
+import threading
+from collections import deque
 from pythonosc import udp_client
+from pythonosc.osc_bundle_builder import OscBundleBuilder, IMMEDIATELY
+from pythonosc.osc_message_builder import OscMessageBuilder
+import metrics
+from metrics import now
 
 class OSCSender:
     def __init__(self, host: str, port: int):
@@ -7,4 +14,67 @@ class OSCSender:
 
     def send(self, path: str, value):
         # VRChat expects ints/floats/bools
+        t0 = now()
         self.client.send_message(path, value)
+        metrics.stage["send"].since(t0)
+        metrics.osc_sent.inc()
+
+    def send_bundle(self, items):
+        """Send [(path, value), ...] as a single UDP packet."""
+        t0 = now()
+        bundle = OscBundleBuilder(IMMEDIATELY)
+        for path, value in items:
+            msg = OscMessageBuilder(address=path)
+            msg.add_arg(value)
+            bundle.add_content(msg.build())
+        self.client.send(bundle.build())
+        metrics.stage["send"].since(t0)
+        metrics.osc_sent.inc(len(items))
+
+
+class PacedSender:
+    """
+    Sends many parameters without flooding the receiver: messages are grouped into
+    bundles of `batch` and at most `rate` packets per second leave the socket.
+    rate 0 (or less) sends the bundles back to back, unpaced.
+    A new send_many() replaces whatever of the previous one is still queued.
+    """
+
+    def __init__(self, sender: OSCSender, rate=100, batch=8):
+        self.sender = sender
+        self.rate = rate
+        self.batch = batch
+        self._pending = deque()
+        self._wake = threading.Condition()
+        self._idle = threading.Event(); self._idle.set()
+        threading.Thread(target=self._run, daemon=True, name="paced-sender").start()
+
+    def send_many(self, items):
+        with self._wake:
+            self._pending = deque(items)
+            if self._pending:
+                self._idle.clear()
+            self._wake.notify()
+
+    def wait(self, timeout=None):
+        """Block until everything queued has been sent."""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        next_at = time.monotonic()
+        while True:
+            with self._wake:
+                while not self._pending:
+                    self._idle.set()
+                    self._wake.wait()
+                pending = self._pending
+                chunk = [pending.popleft() for _ in range(min(max(1, self.batch), len(pending)))]
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.sender.send_bundle(chunk)
+            except OSError as e:
+                print(f"Paced send failed: {e}")
+            interval = 1.0 / self.rate if self.rate > 0 else 0.0
+            next_at = max(next_at, time.monotonic() - interval) + interval
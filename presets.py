@@ -0,0 +1,46 @@
+# presets.py
+import json
+
+PRESETS_FILE = 'presets.json'
+
+# VRChat driven parameters, they can be read but sending them does nothing useful
+BUILTIN_PARAMS = {
+    'IsLocal', 'Viseme', 'Voice', 'GestureLeft', 'GestureRight', 'GestureLeftWeight',
+    'GestureRightWeight', 'AngularY', 'VelocityX', 'VelocityY', 'VelocityZ',
+    'VelocityMagnitude', 'Upright', 'Grounded', 'Seated', 'AFK', 'TrackingType',
+    'VRMode', 'MuteSelf', 'InStation', 'Earmuffs', 'IsOnFriendsList', 'AvatarVersion',
+    'ScaleModified', 'ScaleFactor', 'ScaleFactorInverse', 'EyeHeightAsMeters',
+    'EyeHeightAsPercent', 'IsAnimatorEnabled',
+}
+PREFIX = '/avatar/parameters/'
+
+
+def load_presets(path=PRESETS_FILE):
+    """{avatar_id: {preset name: {address: value}}}"""
+    try:
+        with open(path) as f: return json.load(f)
+    except: return {}
+
+
+def save_presets(presets, path=PRESETS_FILE):
+    with open(path, 'w') as f:
+        json.dump(presets, f, indent=2)
+
+
+def snapshot(param_values, available_params=None):
+    """Settable avatar parameters from the last values VRChat sent us."""
+    writable = {p['address'] for p in available_params or ()}
+    state = {}
+    for addr, value in list(param_values.items()):
+        if not addr.startswith(PREFIX) or addr[len(PREFIX):] in BUILTIN_PARAMS:
+            continue
+        if writable and addr not in writable:
+            continue
+        if isinstance(value, (bool, int, float)):
+            state[addr] = value
+    return state
+
+
+def changed_params(preset, param_values):
+    """(address, value) pairs of the preset that differ from the current avatar state."""
+    return [(addr, value) for addr, value in preset.items() if param_values.get(addr) != value]
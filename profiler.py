@@ -0,0 +1,290 @@
+# profiler.py
+import os
+import re
+import sys
+import gzip
+import time
+import atexit
+import marshal
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+MODES = ("OFF", "SAMPLE", "CPROFILE")
+
+# what _write() produces; _prune() leaves every other file in out_dir alone
+OWN_FILES = re.compile(r"(stacks|memory)-\d{8}-\d{6}\.txt\.gz|cprofile-.+-\d{8}-\d{6}\.pstats\.gz")
+
+
+def _stamp():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def _thread_label(name):
+    # per-request OSC handler threads are called "Thread-123 (process_request_thread)"
+    return re.sub(r"Thread-\d+\s*", "", name).strip("() ") or name
+
+
+class Profiler:
+    """
+    Opt-in profiling for bug reports. Nothing is hooked while mode is OFF.
+
+    SAMPLE   - a background thread grabs every thread's stack each `interval`
+               seconds and writes collapsed stacks (flamegraph / speedscope format)
+    CPROFILE - cProfile around the thread targets passed through wrap(), dumped
+               as gzipped marshal pstats when the thread ends, and around the
+               callbacks passed through wrap_handler(), merged per name.
+               From Python 3.12 only one cProfile can be enabled per process and
+               it sees every thread, so there one profile is started in start()
+               and dumped as "process" every flush_every seconds and on stop();
+               wrap() and wrap_handler() then leave their targets alone.
+    tracemalloc snapshots are taken every `tracemalloc_interval` seconds in both modes
+    (0 disables them).
+
+    Output goes to `out_dir` as .gz files; only the newest `max_files` of the
+    profiler's own files are kept.
+    """
+
+    def __init__(self):
+        self.mode = "OFF"
+        self.out_dir = "profiles"
+        self.interval = 0.01
+        self.flush_every = 300.0
+        self.tracemalloc_interval = 60.0
+        self.tracemalloc_frames = 8
+        self.max_stacks = 20000
+        self.max_files = 48
+        self.running = False
+        self._stop_event = threading.Event()
+        self._stacks = {}
+        self._overflow = 0
+        self._last_snapshot = None
+        self._label_cache = {}
+        self._active = {}  # name -> cProfile.Profile still running
+        self._merged = {}  # name -> pstats.Stats of wrap_handler() calls not dumped yet
+        self._merge_lock = threading.Lock()
+        self.process_wide = sys.version_info >= (3, 12)
+        self._process_prof = None
+
+    @property
+    def enabled(self):
+        return self.mode != "OFF"
+
+    def configure(self, mode="OFF", **options):
+        mode = str(mode).upper()
+        if mode not in MODES:
+            print(f"Unknown profile mode '{mode}', profiling stays off", file=sys.stderr)
+            mode = "OFF"
+        self.mode = mode
+        for k, v in options.items():
+            if v is not None and hasattr(self, k):
+                setattr(self, k, v)
+        return self
+
+    def start(self):
+        if not self.enabled or self.running:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.running = True
+        self._stop_event.clear()
+        if self.tracemalloc_interval and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        if self.mode == "CPROFILE" and self.process_wide:
+            self._start_process_profile()
+        threading.Thread(target=self._run, daemon=True, name="profiler").start()
+        atexit.register(self.stop)
+        print(f"Profiling enabled ({self.mode}), writing to {os.path.abspath(self.out_dir)}")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        self._flush_stacks()
+        # daemon threads (OSC server) never return, dump what they have so far
+        for name, prof in list(self._active.items()):
+            if self._active.pop(name, None) is prof:
+                self._dump_cprofile(prof, name)
+        self._flush_merged()
+        self._rotate_process_profile(restart=False)
+        if tracemalloc.is_tracing():
+            self._snapshot()
+            tracemalloc.stop()
+
+    def wrap(self, target, name):
+        """Return target unchanged unless in CPROFILE mode."""
+        if self.mode != "CPROFILE" or self.process_wide:
+            return target
+
+        def profiled(*args, **kwargs):
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                # another profiler is already active in this process
+                print(f"Profiler: '{name}' runs unprofiled, another profiler is active", file=sys.stderr)
+                return target(*args, **kwargs)
+            self._active[name] = prof
+            try:
+                return target(*args, **kwargs)
+            finally:
+                prof.disable()
+                if self._active.pop(name, None) is prof:
+                    self._dump_cprofile(prof, name)
+        return profiled
+
+    def wrap_handler(self, handler, name):
+        """
+        Like wrap(), for callbacks that run on short-lived threads (the OSC server
+        starts one per packet). Each call is profiled on its own and merged under
+        name; dumped every flush_every seconds and on stop().
+        """
+        if self.mode != "CPROFILE" or self.process_wide:
+            return handler
+
+        def profiled(*args, **kwargs):
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                return handler(*args, **kwargs)  # another profiler is active
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                prof.disable()
+                with self._merge_lock:
+                    merged = self._merged.get(name)
+                    if merged is None:
+                        self._merged[name] = pstats.Stats(prof)
+                    else:
+                        merged.add(prof)
+        return profiled
+
+    # -- background work ------------------------------------------------
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_every
+        next_snap = time.monotonic() + (self.tracemalloc_interval or float("inf"))
+        sampling = self.mode == "SAMPLE"
+        wait = self.interval if sampling else 1.0
+        while not self._stop_event.wait(wait):
+            if sampling:
+                self._sample()
+            t = time.monotonic()
+            if t >= next_flush:
+                if sampling:
+                    self._flush_stacks()
+                self._flush_merged()
+                self._rotate_process_profile()
+                next_flush = t + self.flush_every
+            if t >= next_snap:
+                self._snapshot()
+                next_snap = t + self.tracemalloc_interval
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            key = (names.get(ident, "?"), tuple(codes))
+            stacks = self._stacks
+            if key in stacks:
+                stacks[key] += 1
+            elif len(stacks) < self.max_stacks:
+                stacks[key] = 1
+            else:
+                self._overflow += 1  # memory stays bounded, count what we dropped
+
+    def _frame_label(self, code):
+        label = self._label_cache.get(code)
+        if label is None:
+            label = f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+            self._label_cache[code] = label
+        return label
+
+    def _flush_stacks(self):
+        stacks, self._stacks = self._stacks, {}
+        overflow, self._overflow = self._overflow, 0
+        if not stacks:
+            return
+        lines = []
+        for (tname, codes), count in stacks.items():
+            frames = ";".join(self._frame_label(c) for c in reversed(codes))
+            lines.append(f"{_thread_label(tname)};{frames} {count}")
+        if overflow:
+            lines.append(f"[dropped: too many distinct stacks] {overflow}")
+        self._write(f"stacks-{_stamp()}.txt.gz", "\n".join(lines).encode("utf-8"))
+        self._label_cache.clear()
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            return
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        out = [f"traced current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB", "", "Top allocations:"]
+        out += [str(s) for s in snap.statistics("lineno")[:50]]
+        if self._last_snapshot is not None:
+            out += ["", "Growth since previous snapshot:"]
+            out += [str(s) for s in snap.compare_to(self._last_snapshot, "lineno")[:50]]
+        self._last_snapshot = snap  # keep just one to stay bounded
+        self._write(f"memory-{_stamp()}.txt.gz", "\n".join(out).encode("utf-8"))
+
+    def _dump_cprofile(self, prof, name):
+        prof.create_stats()
+        # gunzip and load with pstats.Stats(path) or snakeviz
+        self._write(f"cprofile-{name}-{_stamp()}.pstats.gz", marshal.dumps(prof.stats))
+
+    def _start_process_profile(self):
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError as e:
+            print(f"Profiler: can't start cProfile ({e}), CPROFILE gives no output", file=sys.stderr)
+            return
+        self._process_prof = prof
+
+    def _rotate_process_profile(self, restart=True):
+        """Dump the process-wide profile so far and, unless stopping, start a fresh one."""
+        prof, self._process_prof = self._process_prof, None
+        if prof is None:
+            return
+        prof.disable()
+        self._dump_cprofile(prof, "process")
+        if restart:
+            self._start_process_profile()
+
+    def _flush_merged(self):
+        with self._merge_lock:
+            merged, self._merged = self._merged, {}
+        for name, stats in merged.items():
+            self._write(f"cprofile-{name}-{_stamp()}.pstats.gz", marshal.dumps(stats.stats))
+
+    def _write(self, filename, payload):
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with gzip.open(os.path.join(self.out_dir, filename), "wb") as f:
+                f.write(payload)
+            self._prune()
+        except Exception as e:
+            print(f"Profiler write failed: {e}", file=sys.stderr)
+
+    def _prune(self):
+        files = sorted(
+            (os.path.join(self.out_dir, n) for n in os.listdir(self.out_dir) if OWN_FILES.fullmatch(n)),
+            key=os.path.getmtime,
+        )
+        for path in files[:-self.max_files]:
+            os.remove(path)
+
+
+profiler = Profiler()
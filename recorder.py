@@ -0,0 +1,165 @@
+# recorder.py
+import os
+import time
+import struct
+import threading
+from fnmatch import fnmatch
+
+RECORDINGS_DIR = "recordings"
+EXTENSION = ".vrec"
+
+# File layout: 16 byte header, then fixed 16 byte records.
+#   header: magic, wall clock start in microseconds
+#   record: time in 100 µs ticks since start, address id, kind, value as float64
+# An address is interned the first time it is seen with a KIND_ADDRESS record whose
+# value is the byte length of the UTF-8 address that follows, padded to 16 bytes.
+MAGIC = b"VOSCREC1"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<IHBxd")
+TICKS_PER_SECOND = 10000
+
+KIND_ADDRESS, KIND_FLOAT, KIND_INT, KIND_BOOL = range(4)
+
+
+def recording_path(name):
+    if not name.endswith(EXTENSION):
+        name += EXTENSION
+    return os.path.join(RECORDINGS_DIR, name)
+
+
+def list_recordings():
+    try:
+        return sorted(n[:-len(EXTENSION)] for n in os.listdir(RECORDINGS_DIR) if n.endswith(EXTENSION))
+    except FileNotFoundError:
+        return []
+
+
+class ParamRecorder:
+    """
+    Appends timestamped avatar parameter changes to a .vrec file.
+
+    record() is called straight from the OSC handler threads: it packs one
+    16 byte record into the buffered file, so no extra thread is needed.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._fh = open(path, "wb", buffering=1 << 16)
+        self._fh.write(HEADER.pack(MAGIC, int(time.time() * 1e6)))
+        self._t0 = time.monotonic()
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, address, value):
+        if isinstance(value, bool):
+            kind = KIND_BOOL
+        elif isinstance(value, int):
+            kind = KIND_INT
+        elif isinstance(value, float):
+            kind = KIND_FLOAT
+        else:
+            return  # strings/blobs are not avatar parameters
+        ticks = int((time.monotonic() - self._t0) * TICKS_PER_SECOND)
+        with self._lock:
+            fh = self._fh
+            if fh is None:
+                return
+            aid = self._ids.get(address)
+            if aid is None:
+                aid = len(self._ids)
+                if aid > 0xFFFF:
+                    return
+                self._ids[address] = aid
+                raw = address.encode("utf-8")
+                fh.write(RECORD.pack(ticks, aid, KIND_ADDRESS, len(raw)))
+                fh.write(raw.ljust(-(-len(raw) // RECORD.size) * RECORD.size, b"\0"))
+            fh.write(RECORD.pack(ticks, aid, kind, value))
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def read_recording(path):
+    """Return (addresses, events) where events is a list of (seconds, address_id, value)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, _start_us = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a VoiceToOSC recording")
+    addresses = []
+    events = []
+    pos = HEADER.size
+    end = len(data) - RECORD.size
+    unpack = RECORD.unpack_from
+    while pos <= end:
+        ticks, aid, kind, value = unpack(data, pos)
+        pos += RECORD.size
+        if kind == KIND_ADDRESS:
+            n = int(value)
+            addresses.append(data[pos:pos + n].decode("utf-8"))
+            pos += -(-n // RECORD.size) * RECORD.size
+            continue
+        if kind == KIND_BOOL:
+            value = value != 0
+        elif kind == KIND_INT:
+            value = int(value)
+        events.append((ticks / TICKS_PER_SECOND, aid, value))
+    return addresses, events
+
+
+class Replay:
+    """
+    Streams a recording back out through an OSCSender on its own thread.
+
+    speed: 2.0 plays twice as fast. include/exclude: fnmatch patterns on the address,
+    e.g. ["/avatar/parameters/Hand*"].
+    """
+
+    def __init__(self, sender, path, speed=1.0, include=None, exclude=None):
+        self.sender = sender
+        self.path = path
+        self.speed = speed if speed and speed > 0 else 1.0
+        self.include = include or []
+        self.exclude = exclude or []
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def _allowed(self, address):
+        if self.include and not any(fnmatch(address, p) for p in self.include):
+            return False
+        return not any(fnmatch(address, p) for p in self.exclude)
+
+    def start(self):
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="replay")
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        addresses, events = read_recording(self.path)
+        allowed = [self._allowed(a) for a in addresses]
+        send = self.sender.send
+        speed = self.speed
+        t0 = time.monotonic()
+        for t, aid, value in events:
+            if not allowed[aid]:
+                continue
+            # absolute schedule, so send time doesn't accumulate drift
+            delay = t0 + t / speed - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                return
+            if self._stop_event.is_set():
+                return
+            send(addresses[aid], value)
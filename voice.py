@@ -1,17 +1,75 @@
 # voice.py
 import threading
 import queue
-import json
 import sys
 import os
 import gc
-import sounddevice as sd
+import time
+from array import array
+from collections import deque
 from vosk import Model, KaldiRecognizer
+import metrics
+from metrics import now
+from profiler import profiler
+from audio_source import MicrophoneSource, SAMPLE_RATE, BLOCK_SIZE
+from vosk_json import final_text, partial_text
+
+BLOCKS_PER_SECOND = SAMPLE_RATE / BLOCK_SIZE
+MAX_PENDING_S = 30
+
+# Kaldi endpointing per profile, as SetEndpointerDelays(t_start_max, t_end, t_max):
+# silence allowed before speech, trailing silence that ends an utterance, longest utterance
+ENDPOINT_PROFILES = {
+    'short':     (3.0, 0.25, 8.0),   # single commands, the final result comes right after you stop
+    'balanced':  (5.0, 0.5, 20.0),   # Kaldi's defaults
+    'dictation': (10.0, 1.2, 30.0),  # whole sentences for the chatbox, pauses don't cut them off
+}
+SPEECH_CHUNK = SAMPLE_RATE // 50     # 20 ms resolution when finding where speech ended
+
+
+def peak_level(data):
+    """Peak absolute amplitude of an int16 PCM block, cheap enough for every block."""
+    samples = array('h', data)
+    if not samples:
+        return 0
+    return max(max(samples), -min(samples))
+
+
+def speech_end(data, level):
+    """Samples into the block where the last 20 ms chunk reaching level ends, 0 if none does."""
+    samples = array('h', data)
+    for end in range(len(samples), 0, -SPEECH_CHUNK):
+        chunk = samples[max(0, end - SPEECH_CHUNK):end]
+        if max(chunk) >= level or -min(chunk) >= level:
+            return end
+    return 0
+
+
+def pick_endpointing(setting, stt_mode, log):
+    """
+    Profile for a setting. 'auto' is opt-in: short while speech to chatbox is OFF,
+    dictation while it is on. Unknown names fall back to balanced, reported through log(msg).
+    """
+    if setting == 'auto':
+        return 'short' if stt_mode == 'OFF' else 'dictation'
+    if setting not in ENDPOINT_PROFILES:
+        log(f"Unknown endpointing '{setting}', using balanced ({', '.join(ENDPOINT_PROFILES)} or auto)")
+        return 'balanced'
+    return setting
+
 
 class VoiceRecognizer:
-    def __init__(self, callback, partial_callback, model_path="models/vosk-model-small-en-us-0.15", device=None):
+    def __init__(self, callback, partial_callback, model_path="models/vosk-model-small-en-us-0.15", device=None,
+                 idle_unload_s=0, wake_level=1500, preroll_s=1.0, model=None, source=None):
         """
         callback(phrase: str)
+        model: an already loaded vosk.Model to decode with instead of loading model_path,
+        e.g. one a parent process loaded before forking. Reloads reuse it as well.
+        source: where audio comes from (see audio_source.py), None listens to device.
+        idle_unload_s: release the model after this many seconds without speech (0 = never).
+        While unloaded only a peak level check runs on the audio; a block above
+        wake_level reloads the model in the background and everything captured
+        from preroll_s before that block is decoded once it is ready.
         """
         if not os.path.isdir(str(model_path)):
             print(
@@ -25,52 +83,248 @@ class VoiceRecognizer:
         self.callback = callback
         self.partial_callback = partial_callback
         self.q = queue.Queue()
-        self.model = Model(model_path)
-        self.recognizer = KaldiRecognizer(self.model, 16000)
+        self.model_path = model_path
+        self.shared_model = model
+        self.model = None
+        self.recognizer = None
+        self.endpointing = 'balanced'
+        self._endpoint_dirty = True  # set on the recognizer before the next block
+        self._load_model()
         self._stop_event = threading.Event()
         self.device = device
+        self.source = source
+        self._blackbox = None    # blackbox.BlackBox keeping what gets decoded
+        self._blackbox_lock = threading.Lock()  # held by _decode while it uses the box
+        self._segment_start = 0
+
+        self.idle_unload_s = idle_unload_s
+        self.wake_level = wake_level
+        self.last_speech = time.monotonic()
+        self.last_reload_s = None
+        self._preroll = deque(maxlen=max(1, int(preroll_s * BLOCKS_PER_SECOND)))
+        self._pending = ()       # audio captured while the model reloads
+        self._reloading = None   # background loader thread
+        self._fresh = None       # (model, recognizer) handed over by the loader
+
+        # speech end to final result timing, in samples fed to the decoder
+        self._audio_pos = 0
+        self._speech_end = None
+        self._block_at = None    # when the block being decoded was queued
+
+        # recognition gates (mute, AFK, ...), decoding pauses while any is closed
+        self._closed_gates = set()
+        self._gate_preroll = deque(maxlen=self._preroll.maxlen)
+        self.gated_blocks = 0
+
+    def _load_model(self):
+        t0 = now()
+        self.model = self.shared_model or Model(self.model_path)
+        self.recognizer = KaldiRecognizer(self.model, SAMPLE_RATE)
+        self._endpoint_dirty = True
+        self.last_reload_s = now() - t0
+        metrics.model_loaded.set(1)
+
+    def set_endpointing(self, name):
+        """Switch to one of ENDPOINT_PROFILES; takes effect with the next block, the model stays loaded."""
+        if name not in ENDPOINT_PROFILES:
+            raise ValueError(f"unknown endpointing profile {name!r}")
+        if name != self.endpointing:
+            self.endpointing = name
+            self._endpoint_dirty = True
+
+    def _apply_endpointing(self):
+        self._endpoint_dirty = False
+        try:
+            self.recognizer.SetEndpointerDelays(*ENDPOINT_PROFILES[self.endpointing])
+        except AttributeError:
+            print("This vosk version can't change endpointing (needs 0.3.45 or newer)", file=sys.stderr)
+
+    def unload_model(self):
+        """Drop the recognizer and model so their memory goes back to the OS."""
+        self.recognizer = None
+        self.model = None
+        gc.collect()
+        metrics.model_loaded.set(0)
+        print("VoiceRecognizer unloaded model after idle timeout")
+
+    @property
+    def loaded(self):
+        return self.recognizer is not None
+
+    def set_gate(self, name, closed):
+        if closed:
+            self._closed_gates.add(name)
+        else:
+            self._closed_gates.discard(name)
+        metrics.gate_open.set(0 if self._closed_gates else 1)
+
+    @property
+    def closed_gates(self):
+        return sorted(self._closed_gates)
+
+    def cpu_saved_s(self):
+        """Estimated decoder time saved by gating, from the average decode cost."""
+        return self.gated_blocks * metrics.stage["decode"].mean()
+
+    def _reload_in_background(self):
+        def load():
+            t0 = now()
+            try:
+                model = self.shared_model or Model(self.model_path)
+                self._fresh = (model, KaldiRecognizer(model, SAMPLE_RATE))
+            except Exception as e:
+                print(f"VoiceRecognizer reload failed: {e}", file=sys.stderr)
+                self._reloading = None
+                return
+            self.last_reload_s = now() - t0
+            print(f"VoiceRecognizer reloaded model in {self.last_reload_s:.2f}s")
+        # keep at most MAX_PENDING_S of audio should loading take unusually long
+        self._pending = deque(self._preroll, maxlen=int(MAX_PENDING_S * BLOCKS_PER_SECOND))
+        self._preroll.clear()
+        self._reloading = threading.Thread(target=load, daemon=True, name="voice-reload")
+        self._reloading.start()
+
+    def _enqueue(self, data):
+        self.q.put((data, now()))
+
+    @property
+    def blackbox(self):
+        return self._blackbox
+
+    @blackbox.setter
+    def blackbox(self, box):
+        """
+        Hands box (or None) to the decoder, which then owns it: the box it replaces
+        is closed here, after the block being decoded is done with it. Waits for
+        that block, so a new box for the same file can be opened right after.
+        """
+        with self._blackbox_lock:
+            old, self._blackbox = self._blackbox, box
+            self._segment_start = box.position if box is not None else 0
+            if old is not None and old is not box:
+                old.close()
+
+    def _decode(self, data):
+        with self._blackbox_lock:
+            self._decode_block(data)
+
+    def _decode_block(self, data):
+        box = self._blackbox
+        if box is not None:
+            box.write(data)
+        if self._endpoint_dirty:
+            self._apply_endpointing()
+        end = speech_end(data, self.wake_level)
+        if end:
+            self._speech_end = self._audio_pos + end
+        self._audio_pos += len(data) // 2
+        t0 = now()
+        accepted = self.recognizer.AcceptWaveform(data)
+        metrics.stage["decode"].since(t0)
+        if accepted:
+            result = self.recognizer.Result()
+            text = final_text(result)
+            if text and self._speech_end is not None:
+                # trailing audio the endpointer waited for, plus queueing and decoding of this block
+                waited = now() - self._block_at if self._block_at is not None else 0.0
+                silence = (self._audio_pos - self._speech_end) / SAMPLE_RATE
+                metrics.endpoint_latency(self.endpointing).observe(silence + waited)
+            self._speech_end = None
+            if box is not None:
+                # Kaldi decodes from one endpoint to the next, that span is the utterance
+                if text:
+                    box.add_utterance(self._segment_start, box.position, result)
+                self._segment_start = box.position
+            if text:
+                # Print the recognized text to the console
+                print(f"Recognized: {text}")  # print to stdout
+                metrics.utterances.inc()
+                self.last_speech = time.monotonic()
+                self.callback(text)
+        else:
+            # Optionally print partial results
+            partial = partial_text(self.recognizer.PartialResult())
+            if partial:
+                print(f"Partial: {partial}", end="\r")  # overwrite line
+                metrics.partials.inc()
+                self.last_speech = time.monotonic()
+                self.partial_callback(partial)
+
+    def handle_block(self, data):
+        """Run one block of 16 kHz int16 mono PCM through the gates, idle policy and decoder."""
+        if self._closed_gates:
+            # keep only a short pre-roll so speech right as the gate opens isn't lost
+            self._gate_preroll.append(data)
+            self.gated_blocks += 1
+            metrics.gated_blocks.inc()
+            if self.recognizer is not None and self.idle_unload_s and time.monotonic() - self.last_speech > self.idle_unload_s:
+                self.unload_model()
+            return
+        if self._gate_preroll:
+            buffered = list(self._gate_preroll)
+            self._gate_preroll.clear()
+            if self.recognizer is not None:
+                self.recognizer.Reset()  # drop whatever was half decoded when the gate closed
+            if self._blackbox is not None:
+                self._segment_start = self._blackbox.position
+            for block in buffered:
+                self._handle_open(block)
+        self._handle_open(data)
 
-    def _audio_callback(self, indata, frames, time, status):
-        if status:
-            # Print any audio stream warnings to stderr
-            print(f"Audio status: {status}", file=sys.stderr)
-        self.q.put(bytes(indata))
+    def _handle_open(self, data):
+        if self.recognizer is None:
+            if self._fresh is not None:
+                # loader finished: catch up on everything buffered meanwhile
+                self.model, self.recognizer = self._fresh
+                self._endpoint_dirty = True
+                self._fresh = None
+                self._reloading = None
+                metrics.model_loaded.set(1)
+                pending, self._pending = self._pending, ()
+                for block in pending:
+                    self._decode(block)
+                self.last_speech = time.monotonic()
+            elif self._reloading is not None:
+                self._pending.append(data)
+                return
+            elif peak_level(data) >= self.wake_level:
+                self._preroll.append(data)
+                self._reload_in_background()
+                return
+            else:
+                self._preroll.append(data)
+                return
+        self._decode(data)
+        if self.idle_unload_s and time.monotonic() - self.last_speech > self.idle_unload_s:
+            self.unload_model()
 
     def _listen_loop(self):
+        source = self.source or MicrophoneSource(self.device)
         print("VoiceRecognizer started listening")  # notify start
-        with sd.RawInputStream(
-            samplerate=16000,
-            blocksize=3000, #change for buffer lenght
-            device=self.device,
-            dtype="int16",
-            channels=1,
-            callback=self._audio_callback
-        ):
+        self.last_speech = time.monotonic()
+        source.start(self._enqueue)
+        try:
             while not self._stop_event.is_set():
-                data = self.q.get()
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    text = result.get("text", "").strip()
-                    if text:
-                        # Print the recognized text to the console
-                        print(f"Recognized: {text}")  # print to stdout
-                        self.callback(text)
-                else:
-                    # Optionally print partial results
-                    partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
-                    if partial:
-                        print(f"Partial: {partial}", end="\r")  # overwrite line
-                        self.partial_callback(partial)
+                try:
+                    data, queued_at = self.q.get(timeout=0.5)
+                except queue.Empty:
+                    continue  # a network source can go quiet, keep checking for stop()
+                metrics.stage["queue"].observe(now() - queued_at)
+                metrics.queue_depth.set(self.q.qsize())
+                self._block_at = queued_at
+                self.handle_block(data)
+        finally:
+            source.stop()
 
         print("VoiceRecognizer stopped listening")  # notify stop
 
     def start(self):
         self._stop_event.clear()
-        self.thread = threading.Thread(target=self._listen_loop, daemon=True)
+        self.thread = threading.Thread(target=profiler.wrap(self._listen_loop, "voice"), daemon=True, name="voice")
         self.thread.start()
 
     def stop(self):
-        del self.model; gc.collect()
+        self.model = None; gc.collect()
         self._stop_event.set()
         self.thread.join()
         gc.collect()
@@ -0,0 +1,13 @@
+# vosk_json.py
+"""Reading Vosk's JSON results, kept apart from voice.py so it can be used without vosk installed."""
+import json
+
+
+def final_text(result_json):
+    """Text of a Vosk Result()/FinalResult() JSON string."""
+    return json.loads(result_json).get("text", "").strip()
+
+
+def partial_text(result_json):
+    """Text of a Vosk PartialResult() JSON string."""
+    return json.loads(result_json).get("partial", "")